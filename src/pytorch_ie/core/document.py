@@ -1,4 +1,5 @@
 import dataclasses
+import functools
 import logging
 import typing
 from collections import defaultdict
@@ -8,7 +9,9 @@ from typing import (
     Any,
     ClassVar,
     Dict,
+    FrozenSet,
     Iterable,
+    Iterator,
     List,
     Optional,
     Set,
@@ -21,6 +24,9 @@ from typing import (
 
 logger = logging.getLogger(__name__)
 
+# values of these types are immutable, so they do not need to be copied when converting to a dict
+_PRIMITIVE_TYPES = (int, float, str, bool, type(None))
+
 
 def _enumerate_dependencies(
     resolved: List[str],
@@ -28,24 +34,35 @@ def _enumerate_dependencies(
     nodes: List[str],
     current_path: Optional[Set[str]] = None,
 ):
-    current_path = current_path or set()
-    for node in nodes:
-        if node in current_path:
-            raise ValueError(f"circular dependency detected at node: {node}")
-        if node not in resolved:
+    # Iterative depth-first traversal that appends each node after all its dependencies. We keep an
+    # explicit stack of (node, iterator over its dependencies) entries and a single set with the nodes
+    # on the current path instead of recursing and copying the path for each node.
+    path = set(current_path) if current_path is not None else set()
+    resolved_set = set(resolved)
+    stack: List[Tuple[Optional[str], Iterator[str]]] = [(None, iter(nodes))]
+    while len(stack) > 0:
+        parent, dependencies = stack[-1]
+        for node in dependencies:
+            if node in path:
+                raise ValueError(f"circular dependency detected at node: {node}")
+            if node in resolved_set:
+                continue
             # terminal nodes
             if node not in dependency_graph:
                 resolved.append(node)
-            # nodes with dependencies
+                resolved_set.add(node)
+            # nodes with dependencies: enumerate all dependencies first, then append itself
             else:
-                # enumerate all dependencies first, then append itself
-                _enumerate_dependencies(
-                    resolved,
-                    dependency_graph,
-                    nodes=dependency_graph[node],
-                    current_path=current_path | {node},
-                )
-                resolved.append(node)
+                path.add(node)
+                stack.append((node, iter(dependency_graph[node])))
+                break
+        else:
+            # all dependencies of the parent are resolved
+            stack.pop()
+            if parent is not None:
+                path.remove(parent)
+                resolved.append(parent)
+                resolved_set.add(parent)
 
 
 def _is_optional_type(t: Type) -> bool:
@@ -87,6 +104,32 @@ def _is_tuple_of_annotation_types(t: Any) -> bool:
         return False
 
 
+@functools.lru_cache(maxsize=None)
+def _get_annotation_field_names(annotation_class: Type["Annotation"]) -> Tuple[str, ...]:
+    # asdict() is called per annotation, so we avoid collecting the dataclass fields each time
+    return tuple(f.name for f in dataclasses.fields(annotation_class))
+
+
+@functools.lru_cache(maxsize=None)
+def _get_annotation_non_comparison_field_names(
+    annotation_class: Type["Annotation"],
+) -> Tuple[str, ...]:
+    # Annotation._id is calculated for each (referenced) annotation when serializing a document
+    return tuple(f.name for f in dataclasses.fields(annotation_class) if not f.compare)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_annotation_comparison_field_names(
+    annotation_class: Type["Annotation"],
+) -> Tuple[str, ...]:
+    return tuple(
+        f.name for f in dataclasses.fields(annotation_class) if f.compare and f.name != "_targets"
+    )
+
+
+# the result depends only on the annotation class, so we compute it just once per class
+# (typing.get_type_hints() is expensive and asdict() / fromdict() are called per annotation)
+@functools.lru_cache(maxsize=None)
 def _get_reference_fields_and_container_types(
     annotation_class: Type["Annotation"],
 ) -> Dict[str, Any]:
@@ -188,16 +231,16 @@ class Annotation:
     @property
     def non_comparison_fields_and_values(self) -> Tuple[Tuple[str, Any], ...]:
         return tuple(
-            (f.name, getattr(self, f.name)) for f in dataclasses.fields(self) if not f.compare
+            (name, getattr(self, name))
+            for name in _get_annotation_non_comparison_field_names(type(self))
         )
 
     @property
     def comparison_fields_and_values(self) -> Tuple[Tuple[str, Any], ...]:
         # note that we exclude the special _targets field here
         return tuple(
-            (f.name, getattr(self, f.name))
-            for f in dataclasses.fields(self)
-            if f.compare and f.name != "_targets"
+            (name, getattr(self, name))
+            for name in _get_annotation_comparison_field_names(type(self))
         )
 
     @property
@@ -244,12 +287,15 @@ class Annotation:
         if overrides is not None:
             _exclude_fields.update(overrides)
             result.extend(overrides.items())
-        for f in dataclasses.fields(self):
-            if f.name in _exclude_fields:
+        for field_name in _get_annotation_field_names(type(self)):
+            if field_name in _exclude_fields:
                 continue
-            field_value = getattr(self, f.name)
-            value = _asdict_inner(field_value, dict)
-            result.append((f.name, value))
+            field_value = getattr(self, field_name)
+            if type(field_value) in _PRIMITIVE_TYPES:
+                value = field_value
+            else:
+                value = _asdict_inner(field_value, dict)
+            result.append((field_name, value))
         dct = dict(result)
         dct["_id"] = self._id
         return dct
@@ -317,10 +363,10 @@ class Annotation:
         :return: a detached copy of the annotation
         """
         kwargs = {}
-        for f in dataclasses.fields(self):
-            if f.name == "_targets":
+        for field_name in _get_annotation_field_names(type(self)):
+            if field_name == "_targets":
                 continue
-            kwargs[f.name] = getattr(self, f.name)
+            kwargs[field_name] = getattr(self, field_name)
         kwargs.update(overrides)
         return type(self)(**kwargs)
 
@@ -342,14 +388,15 @@ class Annotation:
                 annotations
         """
         overrides: Dict[str, Any] = {}
-        for f in dataclasses.fields(self):
-            if f.name == "_targets":
+        for field_name in _get_annotation_field_names(type(self)):
+            if field_name == "_targets":
                 continue
-            field_value = getattr(self, f.name)
+            field_value = getattr(self, field_name)
             if isinstance(field_value, Annotation):
-                if field_value._id in invalid_annotation_ids:
+                field_value_id = field_value._id
+                if field_value_id in invalid_annotation_ids:
                     return None
-                overrides[f.name] = override_annotation_store.get(field_value._id, field_value)
+                overrides[field_name] = override_annotation_store.get(field_value_id, field_value)
             elif isinstance(field_value, tuple):
                 if any(
                     maybe_anno._id in invalid_annotation_ids
@@ -357,7 +404,7 @@ class Annotation:
                     if isinstance(maybe_anno, Annotation)
                 ):
                     return None
-                overrides[f.name] = tuple(
+                overrides[field_name] = tuple(
                     (
                         override_annotation_store.get(maybe_anno._id, maybe_anno)
                         if isinstance(maybe_anno, Annotation)
@@ -403,8 +450,15 @@ class BaseAnnotationList(Sequence[T]):
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, BaseAnnotationList):
             return NotImplemented
-
-        return self._targets == other._targets and self._annotations == other._annotations
+        if self is other:
+            return True
+
+        # comparing the number of annotations is the cheapest check, so we do it first
+        return (
+            len(self._annotations) == len(other._annotations)
+            and self._targets == other._targets
+            and self._annotations == other._annotations
+        )
 
     @overload
     def __getitem__(self, index: int) -> T: ...
@@ -418,14 +472,37 @@ class BaseAnnotationList(Sequence[T]):
     def __len__(self) -> int:
         return len(self._annotations)
 
+    def __iter__(self) -> Iterator[T]:
+        # iterate the underlying list directly instead of calling __getitem__ per index
+        # (the default implementation of Sequence.__iter__)
+        return iter(self._annotations)
+
+    def __contains__(self, annotation: object) -> bool:
+        # the default implementation of Sequence.__contains__ iterates in Python
+        return annotation in self._annotations
+
+    def __reversed__(self) -> Iterator[T]:
+        return reversed(self._annotations)
+
+    def index(self, annotation: Any, start: int = 0, stop: Optional[int] = None) -> int:
+        if stop is None:
+            return self._annotations.index(annotation, start)
+        return self._annotations.index(annotation, start, stop)
+
+    def count(self, annotation: Any) -> int:
+        return self._annotations.count(annotation)
+
     def append(self, annotation: T) -> None:
         targets = tuple(getattr(self._document, target_name) for target_name in self._targets)
         annotation.set_targets(targets)
         self._annotations.append(annotation)
 
     def extend(self, annotations: Iterable[T]) -> None:
+        # resolve the targets just once for all annotations
+        targets = tuple(getattr(self._document, target_name) for target_name in self._targets)
         for annotation in annotations:
-            self.append(annotation)
+            annotation.set_targets(targets)
+            self._annotations.append(annotation)
 
     def __repr__(self) -> str:
         return f"BaseAnnotationList({str(self._annotations)})"
@@ -502,6 +579,8 @@ class AnnotationLayer(BaseAnnotationList[T]):
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, AnnotationLayer):
             return NotImplemented
+        if self is other:
+            return True
 
         return super().__eq__(other) and self.predictions == other.predictions
 
@@ -512,6 +591,147 @@ class AnnotationLayer(BaseAnnotationList[T]):
 D = TypeVar("D", bound="Document")
 
 
+# The following helpers depend only on the document class, but are required for each document instance
+# (e.g. in __post_init__), so we compute them just once per class. Note that the cached results are
+# shared, so the public Document methods return copies of them.
+@functools.lru_cache(maxsize=None)
+def _get_document_fields(document_class: Type["Document"]) -> Tuple[dataclasses.Field, ...]:
+    return tuple(
+        f
+        for f in dataclasses.fields(document_class)
+        if f.name not in {"_annotation_graph", "_annotation_fields"}
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _get_document_field_names(document_class: Type["Document"]) -> FrozenSet[str]:
+    # in contrast to _get_document_fields(), this includes the internal fields
+    return frozenset(f.name for f in dataclasses.fields(document_class))
+
+
+@functools.lru_cache(maxsize=None)
+def _get_document_field_types(document_class: Type["Document"]) -> Dict[str, Type]:
+    result = {}
+    for f in _get_document_fields(document_class):
+        # If we got just the string representation of the type, we resolve the whole class.
+        # But this may be slow, so we only do it if necessary.
+        if not isinstance(f.type, type):
+            return typing.get_type_hints(document_class)
+        result[f.name] = f.type
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def _get_document_annotation_fields(
+    document_class: Type["Document"],
+) -> FrozenSet[dataclasses.Field]:
+    field_types = _get_document_field_types(document_class)
+    return frozenset(
+        f
+        for f in _get_document_fields(document_class)
+        if typing.get_origin(field_types[f.name]) is AnnotationLayer
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _get_document_annotation_types(
+    document_class: Type["Document"],
+) -> Dict[str, Type[Annotation]]:
+    return {
+        name: typing.get_args(field_type)[0]
+        for name, field_type in _get_document_field_types(document_class).items()
+        if typing.get_origin(field_type) is AnnotationLayer
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def _get_document_annotation_layers(
+    document_class: Type["Document"],
+) -> Tuple[Tuple[Tuple[str, Type, Tuple[str, ...]], ...], Dict[str, List[str]]]:
+    """Validate the annotation fields of the document class and collect, for each of them, the name,
+    the layer type and the (ordered) target names to construct the annotation layer. Also returns the
+    annotation graph. Since exceptions are not cached, an invalid document class still raises an
+    error each time a document is created.
+    """
+    annotation_layers = []
+    annotation_graph: Dict[str, List[str]] = {}
+    annotation_field_names = set()
+    targeted = set()
+    field_names = _get_document_field_names(document_class)
+    field_types = _get_document_field_types(document_class)
+    annotation_types = _get_document_annotation_types(document_class)
+    for field in _get_document_annotation_fields(document_class):
+
+        annotation_field_names.add(field.name)
+
+        targets = field.metadata.get("targets")
+        for target in targets:
+            targeted.add(target)
+            if field.name not in annotation_graph:
+                annotation_graph[field.name] = []
+            annotation_graph[field.name].append(target)
+            if target not in field_names:
+                raise TypeError(
+                    f'annotation target "{target}" is not in field names of the document: {set(field_names)}'
+                )
+
+        # check annotation target names and use them together with target names from the AnnotationLayer
+        # to reorder targets, if available
+        target_names = field.metadata.get("target_names")
+        field_type = field_types[field.name]
+        annotation_type = annotation_types[field.name]
+        annotation_target_names = annotation_type.TARGET_NAMES
+        if annotation_target_names is not None:
+            if target_names is not None:
+                if set(target_names) != set(annotation_target_names):
+                    raise TypeError(
+                        f"keys of targets {sorted(target_names)} do not match "
+                        f"{annotation_type.__name__}.TARGET_NAMES {sorted(annotation_target_names)}"
+                    )
+                # reorder targets according to annotation_target_names
+                target_name_mapping = dict(zip(target_names, targets))
+                target_position_mapping = {
+                    i: target_name_mapping[name] for i, name in enumerate(annotation_target_names)
+                }
+                targets = [target_position_mapping[i] for i in range(len(targets))]
+            else:
+                if len(annotation_target_names) != len(targets):
+                    raise TypeError(
+                        f"number of targets {sorted(targets)} does not match number of entries in "
+                        f"{annotation_type.__name__}.TARGET_NAMES: {sorted(annotation_target_names)}"
+                    )
+                # disallow multiple targets when target names are specified in the definition of the Annotation
+                if len(annotation_target_names) > 1:
+                    raise TypeError(
+                        f"A target name mapping is required for AnnotationLayers containing Annotations with "
+                        f'TARGET_NAMES, but AnnotationLayer "{field.name}" has no target_names. You should '
+                        f"pass the named_targets dict containing the following keys (see Annotation "
+                        f'"{annotation_type.__name__}") to annotation_field: {annotation_target_names}'
+                    )
+
+        annotation_layers.append((field.name, field_type, tuple(targets)))
+
+    if "_artificial_root" in annotation_graph:
+        raise ValueError(
+            'Failed to add the "_artificial_root" node to the annotation graph because it already exists. Note '
+            "that AnnotationLayer entries with that name are not allowed."
+        )
+    annotation_graph["_artificial_root"] = list(annotation_field_names - targeted)
+    return tuple(annotation_layers), annotation_graph
+
+
+@functools.lru_cache(maxsize=None)
+def _get_document_dependency_ordered_fields(document_class: Type["Document"]) -> Tuple[str, ...]:
+    _, annotation_graph = _get_document_annotation_layers(document_class)
+    resolved: List[str] = []
+    _enumerate_dependencies(
+        resolved,
+        dependency_graph=annotation_graph,
+        nodes=annotation_graph["_artificial_root"],
+    )
+    return tuple(resolved)
+
+
 @dataclasses.dataclass
 class Document(Mapping[str, Any]):
     # points from annotation field names to lists of target field names
@@ -522,39 +742,19 @@ class Document(Mapping[str, Any]):
 
     @classmethod
     def fields(cls):
-        return [
-            f
-            for f in dataclasses.fields(cls)
-            if f.name not in {"_annotation_graph", "_annotation_fields"}
-        ]
+        return list(_get_document_fields(cls))
 
     @classmethod
     def field_types(cls) -> Dict[str, Type]:
-        result = {}
-        for f in cls.fields():
-            # If we got just the string representation of the type, we resolve the whole class.
-            # But this may be slow, so we only do it if necessary.
-            if not isinstance(f.type, type):
-                return typing.get_type_hints(cls)
-            result[f.name] = f.type
-        return result
+        return dict(_get_document_field_types(cls))
 
     @classmethod
     def annotation_types(cls) -> Dict[str, Type[Annotation]]:
-        return {
-            name: typing.get_args(field_type)[0]
-            for name, field_type in cls.field_types().items()
-            if typing.get_origin(field_type) is AnnotationLayer
-        }
+        return dict(_get_document_annotation_types(cls))
 
     @classmethod
     def annotation_fields(cls) -> Set[dataclasses.Field]:
-        ann_field_types = cls.field_types()
-        return {
-            f
-            for f in cls.fields()
-            if typing.get_origin(ann_field_types[f.name]) is AnnotationLayer
-        }
+        return set(_get_document_annotation_fields(cls))
 
     @classmethod
     def target_names(cls, field_name: str) -> Set[str]:
@@ -594,68 +794,14 @@ class Document(Mapping[str, Any]):
         return len(self._annotation_fields)
 
     def __post_init__(self):
-        targeted = set()
-        field_names = {field.name for field in dataclasses.fields(self)}
-        field_types = self.field_types()
-        for field in self.annotation_fields():
-
-            self._annotation_fields.add(field.name)
-
-            targets = field.metadata.get("targets")
-            for target in targets:
-                targeted.add(target)
-                if field.name not in self._annotation_graph:
-                    self._annotation_graph[field.name] = []
-                self._annotation_graph[field.name].append(target)
-                if target not in field_names:
-                    raise TypeError(
-                        f'annotation target "{target}" is not in field names of the document: {field_names}'
-                    )
-
-            # check annotation target names and use them together with target names from the AnnotationLayer
-            # to reorder targets, if available
-            target_names = field.metadata.get("target_names")
-            field_type = field_types[field.name]
-            annotation_type = typing.get_args(field_type)[0]
-            annotation_target_names = annotation_type.TARGET_NAMES
-            if annotation_target_names is not None:
-                if target_names is not None:
-                    if set(target_names) != set(annotation_target_names):
-                        raise TypeError(
-                            f"keys of targets {sorted(target_names)} do not match "
-                            f"{annotation_type.__name__}.TARGET_NAMES {sorted(annotation_target_names)}"
-                        )
-                    # reorder targets according to annotation_target_names
-                    target_name_mapping = dict(zip(target_names, targets))
-                    target_position_mapping = {
-                        i: target_name_mapping[name]
-                        for i, name in enumerate(annotation_target_names)
-                    }
-                    targets = [target_position_mapping[i] for i in range(len(targets))]
-                else:
-                    if len(annotation_target_names) != len(targets):
-                        raise TypeError(
-                            f"number of targets {sorted(targets)} does not match number of entries in "
-                            f"{annotation_type.__name__}.TARGET_NAMES: {sorted(annotation_target_names)}"
-                        )
-                    # disallow multiple targets when target names are specified in the definition of the Annotation
-                    if len(annotation_target_names) > 1:
-                        raise TypeError(
-                            f"A target name mapping is required for AnnotationLayers containing Annotations with "
-                            f'TARGET_NAMES, but AnnotationLayer "{field.name}" has no target_names. You should '
-                            f"pass the named_targets dict containing the following keys (see Annotation "
-                            f'"{annotation_type.__name__}") to annotation_field: {annotation_target_names}'
-                        )
-
-            field_value = field_type(document=self, targets=targets)
-            setattr(self, field.name, field_value)
-
-        if "_artificial_root" in self._annotation_graph:
-            raise ValueError(
-                'Failed to add the "_artificial_root" node to the annotation graph because it already exists. Note '
-                "that AnnotationLayer entries with that name are not allowed."
-            )
-        self._annotation_graph["_artificial_root"] = list(self._annotation_fields - targeted)
+        annotation_layers, annotation_graph = _get_document_annotation_layers(type(self))
+        for field_name, field_type, targets in annotation_layers:
+            self._annotation_fields.add(field_name)
+            # the targets are cached per document class, so each layer gets its own (mutable) copy
+            field_value = field_type(document=self, targets=list(targets))
+            setattr(self, field_name, field_value)
+        for field_name, field_targets in annotation_graph.items():
+            self._annotation_graph[field_name] = list(field_targets)
 
     def asdict(self):
         dct = {}
@@ -677,8 +823,8 @@ class Document(Mapping[str, Any]):
     @classmethod
     def fromdict(cls: Type[D], dct: Dict) -> D:
         fields = dataclasses.fields(cls)
-        annotation_fields = cls.annotation_fields()
-        field_types = cls.field_types()
+        annotation_fields = _get_document_annotation_fields(cls)
+        annotation_types = _get_document_annotation_types(cls)
 
         cls_kwargs = {}
         for field in fields:
@@ -692,15 +838,13 @@ class Document(Mapping[str, Any]):
 
         name_to_field = {f.name: f for f in annotation_fields}
 
-        dependency_ordered_fields: List[str] = []
-        _enumerate_dependencies(
-            dependency_ordered_fields,
-            dependency_graph=doc._annotation_graph,
-            nodes=doc._annotation_graph["_artificial_root"],
-        )
+        dependency_ordered_fields = _get_document_dependency_ordered_fields(cls)
 
         annotations: Dict[int, Annotation] = {}
         predictions: Dict[int, Annotation] = {}
+        # all annotations and predictions where predictions take precedence, i.e. {**annotations, **predictions},
+        # but updated incrementally instead of being re-created for each prediction
+        annotations_and_predictions: Dict[int, Annotation] = {}
         annotations_per_field = defaultdict(list)
         predictions_per_field = defaultdict(list)
         for field_name in dependency_ordered_fields:
@@ -715,10 +859,9 @@ class Document(Mapping[str, Any]):
             if value is None or not value:
                 continue
 
-            field_type = field_types[field_name]
             # TODO: handle single annotations, e.g. a document-level label
-            if typing.get_origin(field_type) is AnnotationLayer:
-                annotation_class = typing.get_args(field_type)[0]
+            if field_name in annotation_types:
+                annotation_class = annotation_types[field_name]
                 # build annotations
                 for annotation_data in value["annotations"]:
                     annotation_dict = dict(annotation_data)
@@ -726,6 +869,8 @@ class Document(Mapping[str, Any]):
                     # annotations can only reference annotations
                     annotation = annotation_class.fromdict(annotation_dict, annotations)
                     annotations[annotation_id] = annotation
+                    if annotation_id not in predictions:
+                        annotations_and_predictions[annotation_id] = annotation
                     annotations_per_field[field.name].append(annotation)
                 # build predictions
                 for annotation_data in value["predictions"]:
@@ -733,9 +878,10 @@ class Document(Mapping[str, Any]):
                     annotation_id = annotation_dict.pop("_id")
                     # predictions can reference annotations and predictions
                     annotation = annotation_class.fromdict(
-                        annotation_dict, {**annotations, **predictions}
+                        annotation_dict, annotations_and_predictions
                     )
                     predictions[annotation_id] = annotation
+                    annotations_and_predictions[annotation_id] = annotation
                     predictions_per_field[field.name].append(annotation)
             else:
                 raise Exception("Error")
@@ -877,12 +1023,7 @@ class Document(Mapping[str, Any]):
         else:
             override_annotations = dict()
 
-        dependency_ordered_fields: List[str] = []
-        _enumerate_dependencies(
-            dependency_ordered_fields,
-            dependency_graph=self._annotation_graph,
-            nodes=self._annotation_graph["_artificial_root"],
-        )
+        dependency_ordered_fields = _get_document_dependency_ordered_fields(type(self))
         for field_name in dependency_ordered_fields:
             # we process only annotation fields that are not in the override_annotations and the removed_annotations
             # mapping because they are meant to be already manually handled
@@ -956,12 +1097,7 @@ class Document(Mapping[str, Any]):
         are added by window-based processing with overlaps which may lead to duplicated annotations.
         """
 
-        dependency_ordered_fields: List[str] = []
-        _enumerate_dependencies(
-            dependency_ordered_fields,
-            dependency_graph=self._annotation_graph,
-            nodes=self._annotation_graph["_artificial_root"],
-        )
+        dependency_ordered_fields = _get_document_dependency_ordered_fields(type(self))
 
         def get_score(annotation: Annotation) -> float:
             score = getattr(annotation, "score", None)
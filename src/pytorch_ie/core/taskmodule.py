@@ -2,8 +2,21 @@ import copy
 import logging
 from abc import ABC, abstractmethod
 from collections.abc import Iterable, Iterator, Sequence
-from typing import Any, Dict, Generic, List, Optional, Tuple, Type, TypeVar, Union, overload
-
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    overload,
+)
+
+import torch
 import torch.utils.data.dataset as torch_dataset
 from pytorch_lightning.core.mixins import HyperparametersMixin
 from torchmetrics import Metric
@@ -44,6 +57,9 @@ Metadata = Dict[str, Any]
 
 
 class TaskEncoding(Generic[DocumentType, InputEncoding, TargetEncoding]):
+    # there may be millions of task encodings, so avoid the per-instance __dict__
+    __slots__ = ("document", "inputs", "_targets", "metadata")
+
     def __init__(
         self,
         document: DocumentType,
@@ -313,7 +329,7 @@ class TaskModule(
             possible_task_encodings = self.encode_input(document)
 
             # encode_input returns None or an empty list
-            if possible_task_encodings is None or not possible_task_encodings:
+            if not possible_task_encodings:
                 continue
 
             elif isinstance(possible_task_encodings, TaskEncoding):
@@ -324,6 +340,72 @@ class TaskModule(
 
         return task_encodings, documents_in_order
 
+    def _encode_input_is_overridden(self) -> bool:
+        """
+        Check if encode_input() is overridden in a subclass of the class that overrides encode_inputs(). In this
+        case, encode_inputs() should call encode_input() per document (like the default implementation does)
+        instead of encoding all documents at once, otherwise the overridden encode_input() would be ignored.
+        """
+        mro = type(self).__mro__
+        position = {
+            name: next(idx for idx, cls in enumerate(mro) if name in vars(cls))
+            for name in ["encode_input", "encode_inputs"]
+        }
+        return position["encode_input"] < position["encode_inputs"]
+
+    def _encode_inputs_batched(
+        self,
+        documents: Sequence[DocumentType],
+        get_items: Callable[[DocumentType], Sequence[Any]],
+        process_items: Callable[[List[Tuple[DocumentType, Any]]], Any],
+        create_task_encodings: Callable[
+            [DocumentType, Sequence[Any], Any, int],
+            Sequence[TaskEncoding[DocumentType, InputEncoding, TargetEncoding]],
+        ],
+        show_progress: bool = False,
+    ) -> Tuple[
+        List[TaskEncoding[DocumentType, InputEncoding, TargetEncoding]],
+        List[DocumentType],
+    ]:
+        """
+        A variant of encode_inputs() for taskmodules that process the inputs of many documents at once, e.g.
+        with a single call to a fast tokenizer. For each document, get_items(document) returns the items to
+        process, e.g. its partitions. Then, process_items() is called once with the (document, item) pairs of
+        all documents. Finally, create_task_encodings(document, items, processed, first_index) creates the task
+        encodings for each document where first_index is the position of the first item of the document in
+        the processed batch. Documents without any items do not get task encodings.
+
+        Taskmodules that override encode_inputs() with this should fall back to the default implementation if
+        _encode_input_is_overridden() and call this directly (and not encode_inputs()) in encode_input().
+        """
+        # a document might be generated on the fly (e.g. with a Dataset), so we iterate only once
+        documents_in_order = list(documents)
+        items_per_document = [get_items(document) for document in documents_in_order]
+        documents_and_items = [
+            (document, item)
+            for document, items in zip(documents_in_order, items_per_document)
+            for item in items
+        ]
+        if len(documents_and_items) == 0:
+            return [], documents_in_order
+        processed = process_items(documents_and_items)
+
+        task_encodings: List[TaskEncoding[DocumentType, InputEncoding, TargetEncoding]] = []
+        first_index = 0
+        for document, items in tqdm(
+            zip(documents_in_order, items_per_document),
+            total=len(documents_in_order),
+            disable=not show_progress,
+            desc="encode inputs",
+        ):
+            if len(items) > 0:
+                task_encodings.extend(
+                    create_task_encodings(document, items, processed, first_index)
+                )
+                first_index += len(items)
+
+        return task_encodings, documents_in_order
+
     @abstractmethod
     def encode_input(
         self,
@@ -374,9 +456,29 @@ class TaskModule(
         This method has to convert the batch output of the model (i.e. a dict of lists) to the list of individual
         outputs (i.e. a list of dicts). This is in preparation to generate a list of all model outputs that has the
         same length as all model inputs.
+
+        When called from the Pipeline, all tensors in the model output are already moved to the CPU. To avoid
+        expensive element-wise access on tensors (e.g. `tensor[i].item()` in a loop), convert each tensor once,
+        e.g. with `_to_numpy_batch()` or `tensor.tolist()`, and iterate over the result.
         """
         pass
 
+    @staticmethod
+    def _to_numpy_batch(model_output: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Convert all tensor values of the (batched) model output to numpy arrays. Other values are kept as they are.
+        Note that numpy does not support bfloat16, so these tensors are converted to float32.
+        """
+        result = {}
+        for key, value in model_output.items():
+            if isinstance(value, torch.Tensor):
+                value = value.detach().cpu()
+                if value.dtype == torch.bfloat16:
+                    value = value.float()
+                value = value.numpy()
+            result[key] = value
+        return result
+
     def decode(
         self,
         task_encodings: Sequence[TaskEncoding[DocumentType, InputEncoding, TargetEncoding]],
@@ -404,11 +506,14 @@ class TaskModule(
                     documents[document_id] = document if inplace else copy.deepcopy(document)
 
         if not inplace:
+            # Note: we use the plain class instead of the parametrized generic alias because
+            # TaskEncoding[...] would create a new alias object per encoding.
+            task_encoding_cls = TaskEncoding
             task_encodings = [
-                TaskEncoding[DocumentType, InputEncoding, TargetEncoding](
+                task_encoding_cls(
                     document=documents[id(task_encoding.document)],
                     inputs=task_encoding.inputs,
-                    targets=task_encoding.targets if task_encoding.has_targets else None,
+                    targets=task_encoding._targets,
                     metadata=task_encoding.metadata,
                 )
                 for task_encoding in task_encodings
@@ -432,10 +537,15 @@ class TaskModule(
         task_encoding: TaskEncoding[DocumentType, InputEncoding, TargetEncoding],
         task_output: TaskOutput,
     ):
+        # collect the annotations per layer first to add them with a single extend() call per layer
+        # (this resolves the layer targets just once instead of for each annotation)
+        annotations_per_layer: Dict[str, List[Annotation]] = {}
         for annotation_name, annotation in self.create_annotations_from_output(
             task_encoding, task_output
         ):
-            task_encoding.document[annotation_name].predictions.append(annotation)
+            annotations_per_layer.setdefault(annotation_name, []).append(annotation)
+        for annotation_name, annotations in annotations_per_layer.items():
+            task_encoding.document[annotation_name].predictions.extend(annotations)
 
     @abstractmethod
     def create_annotations_from_output(
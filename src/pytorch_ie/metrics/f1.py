@@ -88,9 +88,11 @@ class F1Metric(DocumentMetric):
         gold_annotations = {
             annotation_processor(ann) for ann in document[self.layer] if annotation_filter(ann)
         }
-        tp = len([ann for ann in predicted_annotations & gold_annotations])
-        fn = len([ann for ann in gold_annotations - predicted_annotations])
-        fp = len([ann for ann in predicted_annotations - gold_annotations])
+        # the false positives and negatives are the remaining predicted and gold annotations,
+        # so we only need to compute the intersection
+        tp = len(predicted_annotations & gold_annotations)
+        fn = len(gold_annotations) - tp
+        fp = len(predicted_annotations) - tp
         return tp, fp, fn
 
     def add_counts(self, counts: Tuple[int, int, int], label: str):
@@ -1,6 +1,9 @@
-from typing import Any, Tuple
+import logging
+import tempfile
+from typing import Any, Optional, Tuple
 
 import torch
+from torch import nn
 from transformers import AutoConfig, AutoModelForSeq2SeqLM, BatchEncoding
 from transformers.modeling_outputs import Seq2SeqLMOutput
 from typing_extensions import TypeAlias
@@ -13,15 +16,55 @@ ModelOutputType: TypeAlias = Seq2SeqLMOutput
 
 ModelStepInputType: TypeAlias = Tuple[ModelInputType]
 
+QUANTIZATION_MODES = ["int8"]
+PRECISION_DTYPES = {"fp32": torch.float32, "fp16": torch.float16, "bf16": torch.bfloat16}
+PREDICT_BACKENDS = ["torch", "onnxruntime"]
+
+logger = logging.getLogger(__name__)
+
 
 @PyTorchIEModel.register()
 class TransformerSeq2SeqModel(PyTorchIEModel, RequiresModelNameOrPath):
-    def __init__(self, model_name_or_path: str, learning_rate: float = 1e-5, **kwargs) -> None:
+    def __init__(
+        self,
+        model_name_or_path: str,
+        learning_rate: float = 1e-5,
+        quantization: Optional[str] = None,
+        precision: str = "fp32",
+        predict_backend: str = "torch",
+        **kwargs,
+    ) -> None:
         super().__init__(**kwargs)
 
+        if quantization is not None and quantization not in QUANTIZATION_MODES:
+            raise ValueError(
+                f"unknown quantization mode: {quantization}. Use one of {QUANTIZATION_MODES} or None."
+            )
+        if precision not in PRECISION_DTYPES:
+            raise ValueError(
+                f"unknown precision: {precision}. Use one of {list(PRECISION_DTYPES)}."
+            )
+        if quantization == "int8" and precision != "fp32":
+            raise ValueError("int8 quantization can only be used with precision fp32")
+        if predict_backend not in PREDICT_BACKENDS:
+            raise ValueError(
+                f"unknown predict backend: {predict_backend}. Use one of {PREDICT_BACKENDS}."
+            )
+        if predict_backend == "onnxruntime" and (quantization is not None or precision != "fp32"):
+            # the export is done from the (fp32) model weights, so these would be ignored
+            raise ValueError(
+                "the onnxruntime predict backend can not be combined with quantization or a "
+                "precision other than fp32"
+            )
+
         self.save_hyperparameters()
 
         self.learning_rate = learning_rate
+        self.predict_backend = predict_backend
+        self.precision = precision
+        self.quantization = quantization
+        # the exported onnxruntime model, created lazily on the first call to predict()
+        self._onnxruntime_model: Optional[Any] = None
 
         if self.is_from_pretrained:
             config = AutoConfig.from_pretrained(model_name_or_path)
@@ -29,7 +72,62 @@ class TransformerSeq2SeqModel(PyTorchIEModel, RequiresModelNameOrPath):
         else:
             self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name_or_path)
 
+        if precision != "fp32":
+            self.model = self.model.to(dtype=PRECISION_DTYPES[precision])
+        if quantization is not None:
+            self.model = self.quantize(self.model, quantization=quantization)
+
+    @staticmethod
+    def quantize(model: nn.Module, quantization: str) -> nn.Module:
+        """Quantize the model weights for inference.
+
+        "int8" applies dynamic INT8 quantization to all linear layers (CPU only). Note that the
+        quantization is applied before the state dict gets loaded when the model is restored via
+        from_pretrained, so the saved weights are already in the quantized format.
+        """
+        if quantization == "int8":
+            logger.info("apply dynamic int8 quantization to linear layers (supported on CPU only)")
+            return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+        else:
+            raise ValueError(f"unknown quantization mode: {quantization}")
+
+    def get_onnxruntime_model(self) -> Any:
+        """Export the current model weights to ONNX and load them with onnxruntime.
+
+        This uses ORTModelForSeq2SeqLM from optimum which runs the usual generate() loop, but with
+        separately exported encoder and decoder sessions. The export is done once and cached, so
+        weights that get modified afterwards (e.g. by further training) are not reflected.
+        """
+        if self._onnxruntime_model is None:
+            try:
+                from optimum.onnxruntime import ORTModelForSeq2SeqLM
+            except ImportError as e:
+                raise ImportError(
+                    "the onnxruntime predict backend requires optimum with onnxruntime support, "
+                    "install it with: pip install optimum[onnxruntime] (or optimum[onnxruntime-gpu])"
+                ) from e
+
+            provider = (
+                "CUDAExecutionProvider" if self.device.type == "cuda" else "CPUExecutionProvider"
+            )
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                self.model.save_pretrained(tmp_dir)
+                self._onnxruntime_model = ORTModelForSeq2SeqLM.from_pretrained(
+                    tmp_dir, export=True, use_cache=True, provider=provider
+                )
+        return self._onnxruntime_model
+
+    def _check_device(self) -> None:
+        # the dynamically quantized linear layers have only CPU kernels, so they would fail with an
+        # obscure error after the model was moved to another device (e.g. by the Pipeline)
+        if self.quantization is not None and self.device.type != "cpu":
+            raise ValueError(
+                f"{self.quantization} quantization is only supported on CPU, but the model is on "
+                f"device {self.device}"
+            )
+
     def forward(self, inputs: ModelInputType) -> ModelOutputType:
+        self._check_device()
         return self.model(**inputs)
 
     def predict(
@@ -37,10 +135,20 @@ class TransformerSeq2SeqModel(PyTorchIEModel, RequiresModelNameOrPath):
         inputs: Any,
         **kwargs,
     ) -> Any:
+        self._check_device()
         if "labels" in inputs:
             inputs = {k: v for k, v in inputs.items() if k != "labels"}
 
-        return self.model.generate(**inputs, **kwargs)
+        if self.predict_backend == "onnxruntime":
+            return self.get_onnxruntime_model().generate(**inputs, **kwargs)
+
+        if self.precision == "fp32":
+            return self.model.generate(**inputs, **kwargs)
+
+        # the weights are already cast, but autocast also covers the ops that generate()
+        # creates on the fly (e.g. for the attention masks and the beam scores)
+        with torch.autocast(device_type=self.device.type, dtype=PRECISION_DTYPES[self.precision]):
+            return self.model.generate(**inputs, **kwargs)
 
     def step(self, batch: ModelStepInputType):
         inputs = batch[0]
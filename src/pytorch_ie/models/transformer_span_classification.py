@@ -142,17 +142,21 @@ class TransformerSpanClassificationModel(
 
         target = []
         for batch_index, seq_length in enumerate(seq_lengths):
-            label_lookup = {
-                (start, end): label for start, end, label in target_tuples[batch_index]
-            }
+            seq_length = int(seq_length)
+            # labels of all span candidates of the sequence, indexed by (span_length - 1, start),
+            # so we only need to loop over the target tuples instead of all span candidates
+            span_labels = torch.zeros(self.max_span_length, seq_length, dtype=torch.int64)
+            for start, end, label in target_tuples[batch_index]:
+                if start is None or end is None:
+                    continue
+                span_length = end - start + 1
+                if 1 <= span_length <= self.max_span_length and start >= 0 and end < seq_length:
+                    span_labels[span_length - 1, start] = label
+            # same order as in _start_end_and_span_length_span_index()
             for span_length in range(1, self.max_span_length + 1):
-                for start_index in range(seq_length + 1 - span_length):
-                    end_index = start_index + span_length - 1
-
-                    label = label_lookup.get((start_index, end_index), 0)
-                    target.append(label)
+                target.append(span_labels[span_length - 1, : max(seq_length + 1 - span_length, 0)])
 
-        return torch.tensor(target)
+        return torch.cat(target)
 
     def forward(self, inputs: ModelInputType) -> ModelOutputType:
         output = self.model(**inputs)
@@ -1,13 +1,25 @@
+import itertools
 import logging
 import os
 import warnings
 from collections import UserDict
 from contextlib import contextmanager
-from typing import Any, Dict, List, MutableSequence, Optional, Sequence, Tuple, Union
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    MutableSequence,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import torch
 import tqdm
-from packaging import version
 from torch import Tensor
 from torch.utils.data import DataLoader
 from transformers.utils import ModelOutput
@@ -16,8 +28,10 @@ from pytorch_ie.core.document import Document
 from pytorch_ie.core.model import PyTorchIEModel
 from pytorch_ie.core.taskmodule import (
     InplaceNotSupportedException,
+    IterableTaskEncodingDataset,
     TaskEncoding,
     TaskEncodingDataset,
+    TaskEncodingSequence,
     TaskModule,
     TaskOutput,
 )
@@ -25,6 +39,29 @@ from pytorch_ie.core.taskmodule import (
 logger = logging.getLogger(__name__)
 
 
+def _tree_map_only(types, fn, tree):
+    """Apply fn to all values of the given types in the (nested) lists, tuples and dicts of tree.
+    Like torch.utils._pytree.tree_map_only, this does not apply fn to these containers themselves.
+    """
+    if type(tree) is dict:
+        return {key: _tree_map_only(types, fn, value) for key, value in tree.items()}
+    elif type(tree) is list:
+        return [_tree_map_only(types, fn, item) for item in tree]
+    elif type(tree) is tuple:
+        return tuple(_tree_map_only(types, fn, item) for item in tree)
+    elif isinstance(tree, types):
+        return fn(tree)
+    else:
+        return tree
+
+
+try:
+    # this is not public API and not available in older torch versions
+    from torch.utils._pytree import tree_map_only
+except ImportError:
+    tree_map_only = _tree_map_only
+
+
 # TODO: use torch.get_autocast_dtype when available
 def get_autocast_dtype(device_type: str):
     if device_type == "cuda":
@@ -35,6 +72,13 @@ def get_autocast_dtype(device_type: str):
         raise ValueError(f"Unsupported device type for half precision autocast: {device_type}")
 
 
+def get_available_cpu_count() -> int:
+    """Get the number of CPUs the current process is allowed to run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
 class Pipeline:
     """
     The Pipeline class is the class from which all pipelines inherit. Refer to this class for methods shared across
@@ -60,6 +104,11 @@ class Pipeline:
             Whether or not to use half precision model. This can be set to :obj:`True` to reduce
             the memory usage of the model. If set to :obj:`True`, the model will be cast to
             :obj:`torch.float16` on supported devices.
+        compile_model (:obj:`bool`, `optional`, defaults to :obj:`False`):
+            Whether or not to compile the model with :obj:`torch.compile`. On CUDA devices, the
+            model is compiled with :obj:`mode="reduce-overhead"` which makes use of CUDA graphs
+            to cut the kernel launch overhead. Note that each new input shape triggers a
+            recompilation, so this works best with inputs that are padded to a fixed length.
     """
 
     default_input_names = None
@@ -70,6 +119,7 @@ class Pipeline:
         taskmodule: TaskModule,
         device: Union[int, str] = "cpu",
         half_precision_model: bool = False,
+        compile_model: bool = False,
         **kwargs,
     ):
         self.taskmodule = taskmodule
@@ -83,6 +133,18 @@ class Pipeline:
         self.model: PyTorchIEModel = model.to(self.device)  # type: ignore
         if half_precision_model:
             self.model = self.model.to(dtype=get_autocast_dtype(self.device.type))
+        if compile_model:
+            if not hasattr(torch.nn.Module, "compile"):
+                raise ValueError(
+                    f"compile_model=True requires torch>=2.2 (for Module.compile()), but the "
+                    f"installed version is {torch.__version__}"
+                )
+            # compile in place (in contrast to torch.compile(model)) because we call
+            # model.predict() and not the model directly
+            self.model.compile(mode="reduce-overhead" if self.device.type == "cuda" else None)
+
+        # a separate stream to copy the next batch to the device while the current one is processed
+        self._copy_stream = torch.cuda.Stream(self.device) if self.device.type == "cuda" else None
 
         self.call_count = 0
         (
@@ -156,33 +218,57 @@ class Pipeline:
         return self._ensure_tensor_on_device(inputs, self.device)
 
     def _ensure_tensor_on_device(self, inputs, device):
-        if isinstance(inputs, ModelOutput):
-            return type(inputs)(
-                {
-                    name: self._ensure_tensor_on_device(tensor, device)
-                    for name, tensor in inputs.items()
-                }
-            )
-        elif isinstance(inputs, dict):
-            return {
-                name: self._ensure_tensor_on_device(tensor, device)
-                for name, tensor in inputs.items()
-            }
-        elif isinstance(inputs, UserDict):
-            return UserDict(
-                {
-                    name: self._ensure_tensor_on_device(tensor, device)
-                    for name, tensor in inputs.items()
-                }
-            )
-        elif isinstance(inputs, list):
-            return [self._ensure_tensor_on_device(item, device) for item in inputs]
-        elif isinstance(inputs, tuple):
-            return tuple(self._ensure_tensor_on_device(item, device) for item in inputs)
-        elif isinstance(inputs, torch.Tensor):
-            return inputs.to(device)
-        else:
-            return inputs
+        # Host to device copies can be asynchronous (they are only truly asynchronous when the
+        # source is in pinned memory, see get_dataloader()). Device to host copies need to be
+        # synchronous because the results are consumed on the CPU.
+        non_blocking = device.type == "cuda"
+
+        def _to_device(value):
+            if isinstance(value, torch.Tensor):
+                return value.to(device, non_blocking=non_blocking)
+            # containers that are not registered as pytree nodes, e.g. BatchEncoding (a UserDict)
+            # or ModelOutput (if transformers does not register it)
+            elif isinstance(value, ModelOutput):
+                return type(value)(self._ensure_tensor_on_device(dict(value.items()), device))
+            elif isinstance(value, (dict, UserDict)):
+                mapping = self._ensure_tensor_on_device(dict(value.items()), device)
+                return mapping if isinstance(value, dict) else UserDict(mapping)
+            else:
+                return value
+
+        return tree_map_only((torch.Tensor, ModelOutput, dict, UserDict), _to_device, inputs)
+
+    def _prefetch_to_device(self, batches: Iterable) -> Iterator:
+        """
+        Copy the next batch to the device on a separate CUDA stream while the current batch gets processed. This
+        yields the batches unchanged if the pipeline does not run on a CUDA device.
+        """
+        if self._copy_stream is None:
+            yield from batches
+            return
+
+        current_stream = torch.cuda.current_stream(self.device)
+
+        def _record_stream(tensor: Tensor) -> Tensor:
+            # the tensor was allocated on the copy stream, but gets used on the current stream
+            tensor.record_stream(current_stream)
+            return tensor
+
+        def _wait_for_copy(batch, copied: torch.cuda.Event):
+            # wait only for the copy of this batch, not for the one of the next batch
+            current_stream.wait_event(copied)
+            return tree_map_only(torch.Tensor, _record_stream, batch)
+
+        prefetched = None
+        for batch in batches:
+            with torch.cuda.stream(self._copy_stream):
+                batch_on_device = self._ensure_tensor_on_device(batch, device=self.device)
+                copied = self._copy_stream.record_event()
+            if prefetched is not None:
+                yield _wait_for_copy(*prefetched)
+            prefetched = (batch_on_device, copied)
+        if prefetched is not None:
+            yield _wait_for_copy(*prefetched)
 
     def _sanitize_parameters(
         self, **pipeline_parameters
@@ -202,17 +288,22 @@ class Pipeline:
         postprocess_parameters: Dict[str, Any] = {}
 
         # set preprocess parameters
-        for p_name in ["document_batch_size"]:
+        for p_name in ["document_batch_size", "stream_encodings"]:
             if p_name in pipeline_parameters:
                 preprocess_parameters[p_name] = pipeline_parameters[p_name]
 
         # set forward parameters
-        for p_name in ["show_progress_bar", "fast_dev_run", "half_precision_ops"]:
+        for p_name in [
+            "show_progress_bar",
+            "fast_dev_run",
+            "half_precision_ops",
+            "sort_by_length",
+        ]:
             if p_name in pipeline_parameters:
                 forward_parameters[p_name] = pipeline_parameters[p_name]
 
         # set dataloader parameters
-        for p_name in ["batch_size", "num_workers"]:
+        for p_name in ["batch_size", "num_workers", "pin_memory"]:
             if p_name in pipeline_parameters:
                 dataloader_params[p_name] = pipeline_parameters[p_name]
 
@@ -244,6 +335,40 @@ class Pipeline:
             raise TypeError("preprocess has to return a sequence")
         return encodings
 
+    def preprocess_lazily(
+        self,
+        documents: Sequence[Document],
+        task_encodings: List[TaskEncoding],
+        documents_in_order: List[Document],
+        document_batch_size: Optional[int] = None,
+        **preprocess_parameters: Dict,
+    ) -> Iterator[TaskEncoding]:
+        """
+        Same as `preprocess`, but encodes the documents batch-wise on demand, so that encoding can be interleaved with
+        model inference. The created encodings and the encoded documents are collected into `task_encodings` and
+        `documents_in_order` because they are required for postprocessing.
+        """
+        self.taskmodule.assert_is_prepared()
+        if document_batch_size is None:
+            document_batch_size = self.taskmodule.encode_document_batch_size or 1
+
+        def encode_batch(document_batch: List[Document]) -> Sequence[TaskEncoding]:
+            batch_encodings, batch_documents_in_order = self.taskmodule.batch_encode(
+                documents=document_batch, encode_target=False
+            )
+            task_encodings.extend(batch_encodings)
+            documents_in_order.extend(batch_documents_in_order)
+            return batch_encodings
+
+        document_batch = []
+        for document in documents:
+            document_batch.append(document)
+            if len(document_batch) >= document_batch_size:
+                yield from encode_batch(document_batch)
+                document_batch = []
+        if len(document_batch) > 0:
+            yield from encode_batch(document_batch)
+
     def _forward(
         self, input_tensors: Tuple[Dict[str, Tensor], Any, Any, Any], **forward_parameters: Dict
     ) -> Dict:
@@ -253,11 +378,15 @@ class Pipeline:
         and `postprocess` to exist, so that the hot path, this method generally can run as fast as possible.
 
         It is not meant to be called directly, `forward` is preferred. It is basically the same but contains additional
-        code surrounding `_forward` making sure tensors and models are on the same device, disabling the training part
-        of the code (leading to faster inference).
+        code surrounding `_forward` making sure tensors and models are on the same device.
+
+        The model is run in the context returned by `get_inference_context` (`torch.inference_mode` by default)
+        which disables the training part of the code (leading to faster inference). Subclasses that overwrite
+        `_forward` should enter the same context.
         """
         inputs = input_tensors[0]
-        return self.model.predict(inputs, **forward_parameters)
+        with self.get_inference_context()():
+            return self.model.predict(inputs, **forward_parameters)
 
     def postprocess(
         self,
@@ -277,33 +406,60 @@ class Pipeline:
         )
 
     def get_inference_context(self):
-        inference_context = (
-            torch.inference_mode
-            if version.parse(torch.__version__) >= version.parse("1.9.0")
-            else torch.no_grad
-        )
-        return inference_context
+        """Return the context manager (factory) that `_forward` runs the model in."""
+        return torch.inference_mode
 
     def forward(self, model_inputs, **forward_params):
         with self.device_placement():
-            inference_context = self.get_inference_context()
-            with inference_context():
-                model_inputs = self._ensure_tensor_on_device(model_inputs, device=self.device)
-                model_outputs = self._forward(model_inputs, **forward_params)
-                model_outputs = self._ensure_tensor_on_device(
-                    model_outputs, device=torch.device("cpu")
-                )
+            model_inputs = self._ensure_tensor_on_device(model_inputs, device=self.device)
+            model_outputs = self._forward(model_inputs, **forward_params)
+            model_outputs = self._ensure_tensor_on_device(
+                model_outputs, device=torch.device("cpu")
+            )
         return model_outputs
 
+    @staticmethod
+    def get_length_order(model_inputs: Sequence[TaskEncoding]) -> Optional[List[int]]:
+        """
+        Get the indices of the model inputs sorted by their length, i.e. the number of input ids. Returns
+        None if the inputs do not provide input ids, e.g. because they are not a mapping.
+        """
+        lengths = []
+        for task_encoding in model_inputs:
+            inputs = task_encoding.inputs
+            if not isinstance(inputs, Mapping) or "input_ids" not in inputs:
+                return None
+            lengths.append(len(inputs["input_ids"]))
+        return sorted(range(len(lengths)), key=lengths.__getitem__)
+
     def get_dataloader(
         self,
-        model_inputs: Sequence[TaskEncoding],
+        model_inputs: Union[Sequence[TaskEncoding], Iterator[TaskEncoding]],
         batch_size: int = 1,
         num_workers: int = 8,
         **kwargs,
     ):
+        # use page-locked memory for the batches when running on the GPU, so that the host to
+        # device copies in _ensure_tensor_on_device() can be done asynchronously
+        kwargs.setdefault("pin_memory", self.device.type == "cuda")
+        # more workers than available CPUs would just compete for them
+        num_workers = min(num_workers, get_available_cpu_count())
+        dataset: Union[TaskEncodingDataset, IterableTaskEncodingDataset]
+        if isinstance(model_inputs, Sequence):
+            dataset = TaskEncodingDataset(model_inputs)
+            # Spawning worker processes does not pay off if there is not at least one full batch
+            # per worker. Note that the dataloader is created per call, so persistent workers
+            # would not help here.
+            if num_workers > 0 and len(model_inputs) < num_workers * batch_size:
+                num_workers = 0
+        else:
+            dataset = IterableTaskEncodingDataset(model_inputs)
+            # The encodings of an iterator are created in the main process (they are collected
+            # for postprocessing and have to refer to the original documents), so we can not
+            # make use of worker processes.
+            num_workers = 0
         dataloader: DataLoader[TaskEncoding] = DataLoader(
-            TaskEncodingDataset(model_inputs),
+            dataset,
             batch_size=batch_size,
             shuffle=False,
             num_workers=num_workers,
@@ -333,6 +489,9 @@ class Pipeline:
                 list of documents.
             document_batch_size (:obj:`int`, `optional`): The batch size to use for encoding the documents with the
                 taskmodule. If not provided, the default batch size of the taskmodule will be used.
+            stream_encodings (:obj:`bool`, `optional`, defaults to :obj:`False`): Whether or not to encode the
+                documents lazily, batch by batch (see `document_batch_size`), while running the model instead of
+                encoding all documents upfront. Note that the dataloader does not use worker processes in this case.
             show_progress_bar (:obj:`bool`, `optional`, defaults to :obj:`False`): Whether or not to show a progress bar
                 during inference.
             fast_dev_run (:obj:`bool`, `optional`, defaults to :obj:`False`): Whether or not to run a fast development
@@ -340,10 +499,17 @@ class Pipeline:
             half_precision_ops (:obj:`bool`, `optional`, defaults to :obj:`False`): Whether or not to use half
                 precision operations. If set to :obj:`True`, the model will be run with half precision operations
                 via :obj:`torch.autocast`.
+            sort_by_length (:obj:`bool`, `optional`, defaults to :obj:`False`): Whether or not to sort the model
+                inputs by their length (number of input ids) before batching them. This reduces the amount of
+                padding per batch. The order of the outputs is not affected.
             batch_size (:obj:`int`, `optional`, defaults to :obj:`1`): The batch size to use for the dataloader. If not
                 provided, a batch size of 1 will be used.
             num_workers (:obj:`int`, `optional`, defaults to :obj:`8`): The number of workers to use for the dataloader.
-                If not provided, 8 workers will be used.
+                If not provided, 8 workers will be used. The number of workers is capped at the number of CPUs
+                that are available to the current process.
+            pin_memory (:obj:`bool`, `optional`): Whether or not the dataloader should put the batches into
+                pinned memory. This allows for asynchronous host to device copies. If not provided, pinned memory
+                is used when running on a CUDA device.
             inplace (:obj:`bool`, `optional`, defaults to :obj:`True`): Whether or not to modify the input documents
                 in place. Requires the input to be a mutable sequence of documents or a single document.
 
@@ -388,30 +554,92 @@ class Pipeline:
 
         # This creates encodings from the documents. It modifies the documents and may produce multiple entries per
         # document.
-        model_inputs = self.preprocess(documents, **preprocess_params)
-        if forward_params.pop("fast_dev_run", False):
-            warnings.warn(
-                "Execute a fast dev run, only the first two model inputs will be processed."
+        fast_dev_run = forward_params.pop("fast_dev_run", False)
+        sort_by_length = forward_params.pop("sort_by_length", False)
+        input_order: Optional[List[int]] = None
+        ordered_model_inputs: Union[Sequence[TaskEncoding], Iterator[TaskEncoding]]
+        stream_encodings = preprocess_params.pop("stream_encodings", False)
+        if stream_encodings:
+            # The encodings are created on demand by the dataloader. We collect them, and the
+            # encoded documents, for postprocessing.
+            task_encodings: List[TaskEncoding] = []
+            documents_in_order: List[Document] = []
+            model_inputs = TaskEncodingSequence(
+                task_encodings=task_encodings, documents_in_order=documents_in_order
             )
-            model_inputs = model_inputs[:2]
-        # Create a dataloader from the model inputs. This uses taskmodule.collate().
-        dataloader = self.get_dataloader(model_inputs=model_inputs, **dataloader_params)
+            ordered_model_inputs = self.preprocess_lazily(
+                documents,
+                task_encodings=task_encodings,
+                documents_in_order=documents_in_order,
+                **preprocess_params,
+            )
+            if fast_dev_run:
+                warnings.warn(
+                    "Execute a fast dev run, only the first two model inputs will be processed."
+                )
+                ordered_model_inputs = itertools.islice(ordered_model_inputs, 2)
+            if sort_by_length:
+                logger.warning(
+                    "sort_by_length is not supported when streaming encodings, ignore it"
+                )
+        else:
+            model_inputs = self.preprocess(documents, **preprocess_params)
+            if fast_dev_run:
+                warnings.warn(
+                    "Execute a fast dev run, only the first two model inputs will be processed."
+                )
+                model_inputs = model_inputs[:2]
+            # Process the model inputs ordered by their length to reduce the amount of padding per
+            # batch. The outputs are put back into the original order before postprocessing.
+            if sort_by_length:
+                input_order = self.get_length_order(model_inputs)
+            ordered_model_inputs = (
+                model_inputs if input_order is None else [model_inputs[idx] for idx in input_order]
+            )
+        batches: Iterable
+        if isinstance(ordered_model_inputs, Sequence) and 0 < len(
+            ordered_model_inputs
+        ) <= dataloader_params.get("batch_size", 1):
+            # All model inputs fit into a single batch (e.g. when processing a single document), so
+            # we collate them directly instead of setting up a dataloader.
+            batches = [self.taskmodule.collate(list(ordered_model_inputs))]
+        else:
+            # Create a dataloader from the model inputs. This uses taskmodule.collate().
+            batches = self.get_dataloader(model_inputs=ordered_model_inputs, **dataloader_params)
 
         show_progress_bar = forward_params.pop("show_progress_bar", False)
         half_precision_ops = forward_params.pop("half_precision_ops", False)
-        model_outputs: List = []
-        with torch.no_grad():
-            with torch.autocast(device_type=self.device.type, enabled=half_precision_ops):
-                for batch in tqdm.tqdm(
-                    dataloader, desc="inference", disable=not show_progress_bar
-                ):
-                    output = self.forward(batch, **forward_params)
-                    processed_output = self.taskmodule.unbatch_output(output)
+        # The outputs are written directly to the position of the respective model input. When
+        # streaming the encodings, the number of model inputs is not known upfront.
+        model_outputs: List = [] if stream_encodings else [None] * len(model_inputs)
+        num_outputs = 0
+        # note: we do not need to enter the inference context here because forward() calls _forward()
+        # which runs the model in the context from get_inference_context() (torch.inference_mode)
+        with torch.autocast(device_type=self.device.type, enabled=half_precision_ops):
+            for batch in self._prefetch_to_device(
+                tqdm.tqdm(batches, desc="inference", disable=not show_progress_bar)
+            ):
+                output = self.forward(batch, **forward_params)
+                processed_output = self.taskmodule.unbatch_output(output)
+                if stream_encodings:
                     model_outputs.extend(processed_output)
-
-        assert len(model_inputs) == len(
-            model_outputs
-        ), f"length mismatch: len(model_inputs) [{len(model_inputs)}] != len(model_outputs) [{len(model_outputs)}]"
+                elif input_order is None:
+                    model_outputs[num_outputs : num_outputs + len(processed_output)] = (
+                        processed_output
+                    )
+                else:
+                    # put the outputs back into the original order of the model inputs
+                    for position, task_output in enumerate(processed_output, start=num_outputs):
+                        model_outputs[input_order[position]] = task_output
+                num_outputs += len(processed_output)
+
+        if stream_encodings and fast_dev_run:
+            # the last encoded document batch may have produced more encodings than processed
+            del task_encodings[num_outputs:]
+
+        assert (
+            len(model_inputs) == num_outputs
+        ), f"length mismatch: len(model_inputs) [{len(model_inputs)}] != number of model outputs [{num_outputs}]"
 
         documents = self.postprocess(
             model_inputs=model_inputs,
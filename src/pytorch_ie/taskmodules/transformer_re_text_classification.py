@@ -7,6 +7,7 @@ workflow:
     -> Document
 """
 
+import functools
 import logging
 from typing import (
     Any,
@@ -24,7 +25,7 @@ from typing import (
 
 import numpy as np
 import torch
-from transformers import AutoTokenizer
+from transformers import AutoTokenizer, BatchEncoding
 from transformers.file_utils import PaddingStrategy
 from transformers.tokenization_utils_base import TruncationStrategy
 from typing_extensions import TypeAlias
@@ -252,11 +253,8 @@ class TransformerRETextClassificationTaskModule(TaskModuleType, ChangesTokenizer
             relations: AnnotationLayer[BinaryRelation] = self.get_relation_layer(document)
             entities: AnnotationLayer[LabeledSpan] = self.get_entity_layer(document)
 
-            for entity in entities:
-                entity_labels.add(entity.label)
-
-            for relation in relations:
-                relation_labels.add(relation.label)
+            entity_labels.update(entity.label for entity in entities)
+            relation_labels.update(relation.label for relation in relations)
 
         if self.none_label in relation_labels:
             relation_labels.remove(self.none_label)
@@ -291,20 +289,52 @@ class TransformerRETextClassificationTaskModule(TaskModuleType, ChangesTokenizer
         self.argument_markers = self.construct_argument_markers()
         self.tokenizer.add_tokens(self.argument_markers, special_tokens=True)
 
-        self.argument_markers_to_id = {
-            marker: self.tokenizer.vocab[marker] for marker in self.argument_markers
-        }
-        self.sep_token_id = self.tokenizer.vocab[self.tokenizer.sep_token]
+        # use convert_tokens_to_ids because the vocab property of fast tokenizers builds the
+        # whole vocabulary dict on every access
+        self.argument_markers_to_id = dict(
+            zip(
+                self.argument_markers,
+                self.tokenizer.convert_tokens_to_ids(self.argument_markers),
+            )
+        )
+        self.sep_token_id = self.tokenizer.convert_tokens_to_ids(self.tokenizer.sep_token)
+
+        # Precompute the marker ids per (argument role, entity label) to not construct and look up the
+        # marker strings for every relation candidate. The entity label is None if the markers do not
+        # contain the entity type.
+        entity_labels: List[str] = self.entity_labels  # type: ignore
+        self._argument_marker_ids: Dict[Tuple[str, Optional[str]], Tuple[int, int]] = {}
+        self._append_marker_ids: Dict[Tuple[str, str], int] = {}
+        for role, role_marker in self.argument_role_to_marker.items():
+            for entity_label in entity_labels if self.add_type_to_marker else [None]:
+                type_suffix = f":{entity_label}" if entity_label is not None else ""
+                self._argument_marker_ids[(role, entity_label)] = (
+                    self.argument_markers_to_id[f"[{role_marker}{type_suffix}]"],
+                    self.argument_markers_to_id[f"[/{role_marker}{type_suffix}]"],
+                )
+            if self.append_markers:
+                for entity_label in entity_labels:
+                    self._append_marker_ids[(role, entity_label)] = self.argument_markers_to_id[
+                        f"[{role_marker}={entity_label}]"
+                    ]
 
         self.id_to_label = {v: k for k, v in self.label_to_id.items()}
 
     def _create_relation_candidates(
         self,
         document: Document,
+        partition: Optional[Span] = None,
     ) -> List[BinaryRelation]:
         relation_candidates: List[BinaryRelation] = []
         relations: AnnotationLayer[BinaryRelation] = self.get_relation_layer(document)
-        entities: AnnotationLayer[LabeledSpan] = self.get_entity_layer(document)
+        entities: Sequence[LabeledSpan] = self.get_entity_layer(document)
+        if partition is not None:
+            # only pair entities that are in the partition
+            entities = [
+                entity
+                for entity in entities
+                if is_contained_in((entity.start, entity.end), (partition.start, partition.end))
+            ]
         arguments_to_relation = {(rel.head, rel.tail): rel for rel in relations}
         # iterate over all possible argument candidates
         for head in entities:
@@ -325,16 +355,7 @@ class TransformerRETextClassificationTaskModule(TaskModuleType, ChangesTokenizer
 
         return relation_candidates
 
-    def encode_input(
-        self,
-        document: TextDocument,
-    ) -> Optional[Union[TaskEncodingType, Sequence[TaskEncodingType]]]:
-        relations: Sequence[BinaryRelation]
-        if self.create_relation_candidates:
-            relations = self._create_relation_candidates(document)
-        else:
-            relations = self.get_relation_layer(document)
-
+    def _get_partitions(self, document: TextDocument) -> Sequence[Span]:
         partitions: Sequence[Span]
         if self.partition_annotation is not None:
             partitions = document[self.partition_annotation]
@@ -346,20 +367,79 @@ class TransformerRETextClassificationTaskModule(TaskModuleType, ChangesTokenizer
         else:
             # use single dummy partition
             partitions = [Span(start=0, end=len(document.text))]
+        return partitions
+
+    def _tokenize_partitions(
+        self, documents_and_partitions: List[Tuple[TextDocument, Span]]
+    ) -> BatchEncoding:
+        without_special_tokens = self.max_window is not None
+        return self.tokenizer(
+            [
+                document.text[partition.start : partition.end]
+                for document, partition in documents_and_partitions
+            ],
+            padding=False,
+            truncation=self.truncation if self.max_window is None else False,
+            max_length=self.max_length,
+            is_split_into_words=False,
+            return_offsets_mapping=False,
+            add_special_tokens=not without_special_tokens,
+        )
+
+    def encode_inputs(
+        self,
+        documents: Sequence[TextDocument],
+        show_progress: bool = False,
+    ) -> Tuple[Sequence[TaskEncodingType], Sequence[TextDocument]]:
+        if self._encode_input_is_overridden():
+            return super().encode_inputs(documents, show_progress=show_progress)
+        return self._encode_documents(documents, show_progress=show_progress)
+
+    def _encode_documents(
+        self,
+        documents: Sequence[TextDocument],
+        show_progress: bool = False,
+    ) -> Tuple[List[TaskEncodingType], List[TextDocument]]:
+        # relation candidates are created per partition, so we tokenize the partitions of all
+        # documents together and create the candidates afterwards
+        return self._encode_inputs_batched(
+            documents,
+            get_items=self._get_partitions,
+            process_items=self._tokenize_partitions,
+            create_task_encodings=self._encode_partitions,
+            show_progress=show_progress,
+        )
 
+    def encode_input(
+        self,
+        document: TextDocument,
+    ) -> Optional[Union[TaskEncodingType, Sequence[TaskEncodingType]]]:
+        task_encodings, _ = self._encode_documents([document])
+        return task_encodings
+
+    def _encode_partitions(
+        self,
+        document: TextDocument,
+        partitions: Sequence[Span],
+        batch_encoding: BatchEncoding,
+        first_batch_index: int,
+    ) -> List[TaskEncodingType]:
+        """Create the task encodings for all relations in the partitions of the document. The partition
+        texts are expected to be tokenized in batch_encoding, starting at first_batch_index."""
+        relations: Sequence[BinaryRelation] = self.get_relation_layer(document)
+        without_special_tokens = self.max_window is not None
         task_encodings: List[TaskEncodingType] = []
-        for partition in partitions:
-            without_special_tokens = self.max_window is not None
-            text = document.text[partition.start : partition.end]
-            encoding = self.tokenizer(
-                text,
-                padding=False,
-                truncation=self.truncation if self.max_window is None else False,
-                max_length=self.max_length,
-                is_split_into_words=False,
-                return_offsets_mapping=False,
-                add_special_tokens=not without_special_tokens,
-            )
+        for partition_index, partition in enumerate(partitions):
+            batch_index = first_batch_index + partition_index
+            partition_input_ids = batch_encoding["input_ids"][batch_index]
+            char_to_token = functools.partial(batch_encoding.char_to_token, batch_index)
+            # the same entity is usually an argument of multiple relations, so we map its character
+            # span to the token span only once per partition
+            token_slice_cache: Dict[Tuple[int, int], Optional[Tuple[int, int]]] = {}
+            if self.create_relation_candidates:
+                # Candidates with arguments outside the partition would be skipped anyway, so we create
+                # them per partition. This avoids pairing all entities of the document.
+                relations = self._create_relation_candidates(document, partition=partition)
 
             for rel in relations:
                 arg_spans: List[LabeledSpan]
@@ -394,14 +474,16 @@ class TransformerRETextClassificationTaskModule(TaskModuleType, ChangesTokenizer
                     continue
 
                 # map character spans to token spans
-                arg_token_slices_including_none = [
-                    get_token_slice(
-                        character_slice=(arg.start, arg.end),
-                        char_to_token_mapper=encoding.char_to_token,
-                        character_offset=partition.start,
-                    )
-                    for arg in arg_spans
-                ]
+                arg_token_slices_including_none: List[Optional[Tuple[int, int]]] = []
+                for arg in arg_spans:
+                    character_slice = (arg.start, arg.end)
+                    if character_slice not in token_slice_cache:
+                        token_slice_cache[character_slice] = get_token_slice(
+                            character_slice=character_slice,
+                            char_to_token_mapper=char_to_token,
+                            character_offset=partition.start,
+                        )
+                    arg_token_slices_including_none.append(token_slice_cache[character_slice])
                 # Check if the mapping was successful. It may fail (and is None) if any argument start or end does not
                 # match a token start or end, respectively.
                 if any(token_slice is None for token_slice in arg_token_slices_including_none):
@@ -425,7 +507,7 @@ class TransformerRETextClassificationTaskModule(TaskModuleType, ChangesTokenizer
                     for span, role, token_slice in zip(arg_spans, arg_roles, arg_token_slices)
                 ]
 
-                input_ids = encoding["input_ids"]
+                input_ids = partition_input_ids
 
                 # windowing: we restrict the input to a window of a maximal size (max_window) with the arguments
                 # of the candidate relation in the center (as much as possible)
@@ -465,36 +547,33 @@ class TransformerRETextClassificationTaskModule(TaskModuleType, ChangesTokenizer
                 # collect all markers with their target positions
                 marker_ids_with_positions = []
                 for arg in args:
-                    marker_ids_with_positions.append(
-                        (self.argument_markers_to_id[arg.as_start_marker], arg.token_span.start)
-                    )
-                    marker_ids_with_positions.append(
-                        (self.argument_markers_to_id[arg.as_end_marker], arg.token_span.end)
-                    )
-
-                # create new input ids with the markers inserted
-                input_ids_with_markers = list(input_ids)
-                offset = 0
+                    start_marker_id, end_marker_id = self._argument_marker_ids[
+                        (arg.role, arg.entity.label if self.add_type_to_marker else None)
+                    ]
+                    marker_ids_with_positions.append((start_marker_id, arg.token_span.start))
+                    marker_ids_with_positions.append((end_marker_id, arg.token_span.end))
+
+                # create new input ids with the markers inserted (in a single pass over the input ids)
+                input_ids_with_markers: List[int] = []
+                previous_position = 0
                 for marker_id, token_position in sorted(
                     marker_ids_with_positions, key=lambda id_pos: id_pos[1]
                 ):
-                    input_ids_with_markers = (
-                        input_ids_with_markers[: token_position + offset]
-                        + [marker_id]
-                        + input_ids_with_markers[token_position + offset :]
-                    )
-                    offset += 1
+                    input_ids_with_markers.extend(input_ids[previous_position:token_position])
+                    input_ids_with_markers.append(marker_id)
+                    previous_position = token_position
+                input_ids_with_markers.extend(input_ids[previous_position:])
 
                 if self.append_markers:
                     for arg in args:
                         if without_special_tokens:
                             input_ids_with_markers.append(self.sep_token_id)
                             input_ids_with_markers.append(
-                                self.argument_markers_to_id[arg.as_append_marker]
+                                self._append_marker_ids[(arg.role, arg.entity.label)]
                             )
                         else:
                             input_ids_with_markers.append(
-                                self.argument_markers_to_id[arg.as_append_marker]
+                                self._append_marker_ids[(arg.role, arg.entity.label)]
                             )
                             input_ids_with_markers.append(self.sep_token_id)
 
@@ -555,19 +634,19 @@ class TransformerRETextClassificationTaskModule(TaskModuleType, ChangesTokenizer
     def unbatch_output(self, model_output: ModelOutputType) -> Sequence[TaskOutputType]:
         logits = model_output["logits"]
 
-        output_label_probs = logits.sigmoid() if self.multi_label else logits.softmax(dim=-1)
-        output_label_probs = output_label_probs.detach().cpu().float().numpy()
-
         unbatched_output = []
         if self.multi_label:
             raise NotImplementedError
         else:
-            label_ids = np.argmax(output_label_probs, axis=-1)
-            for batch_idx, label_id in enumerate(label_ids):
-                label = self.id_to_label[label_id]
-                prob = float(output_label_probs[batch_idx, label_id])
+            # every relation candidate gets only its top label (with its probability), so we do not
+            # compute the probabilities of all relation labels
+            max_logits, max_label_ids = logits.max(dim=-1)
+            max_probs = torch.exp(max_logits - torch.logsumexp(logits, dim=-1))
+            for label_id, prob in zip(
+                max_label_ids.detach().cpu().tolist(), max_probs.detach().cpu().float().tolist()
+            ):
                 result: TaskOutputType = {
-                    "labels": [label],
+                    "labels": [self.id_to_label[label_id]],
                     "probabilities": [prob],
                 }
                 unbatched_output.append(result)
@@ -595,25 +674,30 @@ class TransformerRETextClassificationTaskModule(TaskModuleType, ChangesTokenizer
                 ):
                     label = label[: -len(self.reversed_relation_label_suffix)]
                     head, tail = tail, head
-                new_annotation = BinaryRelation(
-                    head=head, tail=tail, label=label, score=probability
-                )
             elif isinstance(candidate_annotation, NaryRelation):
                 if self.reversed_relation_label_suffix is not None:
                     raise ValueError(f"can not reverse a NaryRelation")
+            else:
+                raise NotImplementedError(
+                    f"creating a new annotation from a candidate_annotation of another type than BinaryRelation is "
+                    f"not yet supported. candidate_annotation has the type: {type(candidate_annotation)}"
+                )
+            # usually, most candidates are predicted with the none label, so we skip them before
+            # creating any new annotation
+            if label == self.none_label:
+                return
+            if isinstance(candidate_annotation, BinaryRelation):
+                new_annotation = BinaryRelation(
+                    head=head, tail=tail, label=label, score=probability
+                )
+            else:
                 new_annotation = NaryRelation(
                     arguments=candidate_annotation.arguments,
                     roles=candidate_annotation.roles,
                     label=label,
                     score=probability,
                 )
-            else:
-                raise NotImplementedError(
-                    f"creating a new annotation from a candidate_annotation of another type than BinaryRelation is "
-                    f"not yet supported. candidate_annotation has the type: {type(candidate_annotation)}"
-                )
-            if label != self.none_label:
-                yield self.relation_annotation, new_annotation
+            yield self.relation_annotation, new_annotation
 
     def collate(self, task_encodings: Sequence[TaskEncodingType]) -> ModelStepInputType:
         input_features = [task_encoding.inputs for task_encoding in task_encodings]
@@ -632,9 +716,15 @@ class TransformerRETextClassificationTaskModule(TaskModuleType, ChangesTokenizer
         target_list: List[TargetEncodingType] = [
             task_encoding.targets for task_encoding in task_encodings
         ]
-        targets = torch.tensor(target_list, dtype=torch.int64)
-
-        if not self.multi_label:
-            targets = targets.flatten()
+        targets: torch.Tensor
+        if self.multi_label:
+            targets = torch.from_numpy(np.asarray(target_list, dtype=np.int64))
+        else:
+            # each target holds exactly one label id, so we collect them into a flat array directly
+            targets = torch.from_numpy(
+                np.fromiter(
+                    (target[0] for target in target_list), dtype=np.int64, count=len(target_list)
+                )
+            )
 
         return inputs, targets
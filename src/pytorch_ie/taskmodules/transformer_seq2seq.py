@@ -11,7 +11,9 @@ import logging
 import re
 from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Type, Union
 
-from transformers import AutoTokenizer
+import numpy as np
+import torch
+from transformers import AutoTokenizer, BatchEncoding
 from transformers.file_utils import PaddingStrategy
 from transformers.tokenization_utils_base import TruncationStrategy
 from typing_extensions import TypeAlias
@@ -150,15 +152,11 @@ class TransformerSeq2SeqTaskModule(TaskModuleType):
         return {"labels": self.encode_text(target_string)["input_ids"]}
 
     def unbatch_output(self, model_output: ModelOutputType) -> Sequence[TaskOutputType]:
-        unbatched_output = []
-        for out in model_output:
-            decoded_string = self.tokenizer.decode(
-                out, skip_special_tokens=False, clean_up_tokenization_spaces=True
-            )
-            triplets = self._extract_triplets(decoded_string)
-            unbatched_output.append(triplets)
-
-        return unbatched_output
+        # decode the whole batch with a single tokenizer call instead of row by row
+        decoded_strings = self.tokenizer.batch_decode(
+            model_output.tolist(), skip_special_tokens=False, clean_up_tokenization_spaces=True
+        )
+        return [self._extract_triplets(decoded_string) for decoded_string in decoded_strings]
 
     def create_annotations_from_output(
         self,
@@ -200,32 +198,79 @@ class TransformerSeq2SeqTaskModule(TaskModuleType):
                 (self.relation_annotation, relation),
             ]
 
-    def collate(self, task_encodings: Sequence[TaskEncodingType]) -> ModelStepInputType:
-        input_features = [task_encoding.inputs for task_encoding in task_encodings]
-
-        padded_encoding = self.tokenizer.pad(
-            input_features,
-            padding=self.padding,
-            max_length=self.max_input_length,
-            pad_to_multiple_of=self.pad_to_multiple_of,
-            return_tensors="pt",
+    def _get_padded_length(
+        self, max_sequence_length: int, max_length: Optional[int]
+    ) -> Optional[int]:
+        """Get the length to pad to, or None if the padding strategy is not supported by `_pad`."""
+        padding = self.padding
+        if isinstance(padding, PaddingStrategy):
+            padding = padding.value
+        if padding is True or padding == "longest":
+            length = max_sequence_length
+        elif padding == "max_length":
+            length = max_length if max_length is not None else self.tokenizer.model_max_length
+            if length < max_sequence_length:
+                return None
+        else:
+            return None
+        if self.pad_to_multiple_of is not None and length % self.pad_to_multiple_of != 0:
+            length = (length // self.pad_to_multiple_of + 1) * self.pad_to_multiple_of
+        return length
+
+    def _pad(
+        self, sequences: Sequence[Sequence[int]], pad_value: int, length: int
+    ) -> torch.Tensor:
+        """Pad the sequences into a single preallocated array and convert it without a copy."""
+        padded = np.full((len(sequences), length), fill_value=pad_value, dtype=np.int64)
+        pad_left = self.tokenizer.padding_side == "left"
+        for idx, sequence in enumerate(sequences):
+            if pad_left:
+                padded[idx, length - len(sequence) :] = sequence
+            else:
+                padded[idx, : len(sequence)] = sequence
+        return torch.from_numpy(padded)
+
+    def _pad_features(
+        self, features: Dict[str, Sequence[Sequence[int]]], max_length: Optional[int]
+    ) -> BatchEncoding:
+        pad_values = {
+            "input_ids": self.tokenizer.pad_token_id,
+            "attention_mask": 0,
+            "token_type_ids": self.tokenizer.pad_token_type_id,
+        }
+        length = self._get_padded_length(
+            max_sequence_length=max(len(ids) for ids in features["input_ids"]),
+            max_length=max_length,
+        )
+        if length is None or not set(features).issubset(pad_values):
+            # fall back to the tokenizer for padding strategies and features that we do not handle
+            return self.tokenizer.pad(
+                features,
+                padding=self.padding,
+                max_length=max_length,
+                pad_to_multiple_of=self.pad_to_multiple_of,
+                return_tensors="pt",
+            )
+        return BatchEncoding(
+            data={
+                key: self._pad(sequences, pad_value=pad_values[key], length=length)
+                for key, sequences in features.items()
+            }
         )
 
+    def collate(self, task_encodings: Sequence[TaskEncodingType]) -> ModelStepInputType:
+        input_features = {
+            key: [task_encoding.inputs[key] for task_encoding in task_encodings]
+            for key in task_encodings[0].inputs.keys()
+        }
+        padded_encoding = self._pad_features(input_features, max_length=self.max_input_length)
+
         if task_encodings[0].has_targets:
-            # TODO: this is a bit of a hack -- fix
             labels = {
                 "input_ids": [task_encoding.targets["labels"] for task_encoding in task_encodings]
             }
+            padded_labels = self._pad_features(labels, max_length=self.max_target_length)
 
-            padded_labels = self.tokenizer.pad(
-                labels,
-                padding=self.padding,
-                max_length=self.max_target_length,
-                pad_to_multiple_of=self.pad_to_multiple_of,
-                return_tensors="pt",
-            )
-
-            # TODO: this is a bit of a hack -- fix
             padded_encoding["labels"] = padded_labels["input_ids"]
 
         return (padded_encoding,)
@@ -81,7 +81,7 @@ class TransformerSpanClassificationTaskModule(TaskModuleType):
         self.single_sentence = single_sentence
         self.sentence_annotation = sentence_annotation
         self.label_to_id = label_to_id or {}
-        self.id_to_label = {v: k for k, v in self.label_to_id.items()}
+        self._update_label_mappings()
         self.padding = padding
         self.truncation = truncation
         self.max_length = max_length
@@ -138,28 +138,57 @@ class TransformerSpanClassificationTaskModule(TaskModuleType):
             self.label_to_id[label] = label_id
             label_id += 1
 
+        self._update_label_mappings()
+
+    def _update_label_mappings(self) -> None:
+        """Create the mappings that are derived from label_to_id."""
         self.id_to_label = {v: k for k, v in self.label_to_id.items()}
+        # span candidates predicted with one of these ids are dropped in unbatch_output
+        self._outside_label_ids = [
+            label_id for label_id, label in self.id_to_label.items() if label == "O"
+        ]
 
-    def encode_input(
-        self,
-        document: TextDocument,
-    ) -> Optional[Union[TaskEncodingType, Sequence[TaskEncodingType]]]:
-        partitions: Sequence[Span]
+    def _get_partitions(self, document: TextDocument) -> Sequence[Span]:
         if self.single_sentence:
-            partitions = document[self.sentence_annotation]
+            return document[self.sentence_annotation]
         else:
-            partitions = [Span(start=0, end=len(document.text))]
-
-        task_encodings: List[TaskEncoding] = []
-        for partition_idx, partition in enumerate(partitions):
-            inputs = self.tokenizer(
-                document.text[partition.start : partition.end],
-                padding=False,
-                truncation=self.truncation,
-                max_length=self.max_length,
-                is_split_into_words=False,
-                return_offsets_mapping=True,
-                return_special_tokens_mask=True,
+            return [Span(start=0, end=len(document.text))]
+
+    def _tokenize_partitions(
+        self, documents_and_partitions: List[Tuple[TextDocument, Span]]
+    ) -> BatchEncoding:
+        return self.tokenizer(
+            [
+                document.text[partition.start : partition.end]
+                for document, partition in documents_and_partitions
+            ],
+            padding=False,
+            truncation=self.truncation,
+            max_length=self.max_length,
+            is_split_into_words=False,
+            return_offsets_mapping=True,
+            return_special_tokens_mask=True,
+        )
+
+    def _encode_partitions(
+        self,
+        document: TextDocument,
+        partitions: Sequence[Span],
+        batch_inputs: BatchEncoding,
+        first_batch_idx: int,
+    ) -> List[TaskEncodingType]:
+        task_encodings: List[TaskEncodingType] = []
+        for partition_idx in range(len(partitions)):
+            batch_idx = first_batch_idx + partition_idx
+            # get a BatchEncoding for the single partition, e.g. to use its char_to_token() method
+            inputs = BatchEncoding(
+                data={key: values[batch_idx] for key, values in batch_inputs.items()},
+                encoding=(
+                    batch_inputs.encodings[batch_idx]
+                    if batch_inputs.encodings is not None
+                    else None
+                ),
+                n_sequences=batch_inputs.n_sequences,
             )
 
             metadata = {
@@ -180,6 +209,36 @@ class TransformerSpanClassificationTaskModule(TaskModuleType):
 
         return task_encodings
 
+    def encode_inputs(
+        self,
+        documents: Sequence[TextDocument],
+        show_progress: bool = False,
+    ) -> Tuple[Sequence[TaskEncodingType], Sequence[TextDocument]]:
+        if self._encode_input_is_overridden():
+            return super().encode_inputs(documents, show_progress=show_progress)
+        return self._encode_documents(documents, show_progress=show_progress)
+
+    def _encode_documents(
+        self,
+        documents: Sequence[TextDocument],
+        show_progress: bool = False,
+    ) -> Tuple[List[TaskEncodingType], List[TextDocument]]:
+        # the fast tokenizer processes the (sentence) partitions of all documents in parallel
+        return self._encode_inputs_batched(
+            documents,
+            get_items=self._get_partitions,
+            process_items=self._tokenize_partitions,
+            create_task_encodings=self._encode_partitions,
+            show_progress=show_progress,
+        )
+
+    def encode_input(
+        self,
+        document: TextDocument,
+    ) -> Optional[Union[TaskEncodingType, Sequence[TaskEncodingType]]]:
+        task_encodings, _ = self._encode_documents([document])
+        return task_encodings
+
     def encode_target(
         self,
         task_encoding: TaskEncodingType,
@@ -226,23 +285,30 @@ class TransformerSpanClassificationTaskModule(TaskModuleType):
         return targets
 
     def unbatch_output(self, model_output: ModelOutputType) -> Sequence[TaskOutputType]:
-        logits = model_output["logits"]
-        probs = F.softmax(logits, dim=-1).detach().cpu().float().numpy()
-        label_ids = torch.argmax(logits, dim=-1).detach().cpu().numpy()
-
-        start_indices = model_output["start_indices"].detach().cpu().numpy()
-        end_indices = model_output["end_indices"].detach().cpu().numpy()
-        batch_indices = model_output["batch_indices"].detach().cpu().numpy()
+        logits = model_output["logits"].detach()
+        # compute the softmax in float32 for numerical stability, even if the model returns
+        # half precision logits (for float32 logits, this is a no-op)
+        probs = F.softmax(logits.float(), dim=-1).cpu().numpy()
+        label_ids = torch.argmax(logits, dim=-1).cpu().numpy()
+
+        numpy_output = self._to_numpy_batch(model_output)
+        start_indices = numpy_output["start_indices"]
+        end_indices = numpy_output["end_indices"]
+        batch_indices = numpy_output["batch_indices"]
+
+        # most span candidates are predicted as "O", so we select the remaining ones (and the
+        # probabilities of their labels) with array operations and loop only over these
+        keep = ~np.isin(label_ids, self._outside_label_ids)
+        label_ids = label_ids[keep]
+        label_probs = probs[keep, label_ids]
 
         tags: List[List[Tuple[str, Tuple[int, int]]]] = [[] for _ in np.unique(batch_indices)]
         probabilities: List[List[float]] = [[] for _ in np.unique(batch_indices)]
         for start, end, batch_idx, label_id, prob in zip(
-            start_indices, end_indices, batch_indices, label_ids, probs
+            start_indices[keep], end_indices[keep], batch_indices[keep], label_ids, label_probs
         ):
-            label = self.id_to_label[label_id]
-            if label != "O":
-                tags[batch_idx].append((label, (start, end)))
-                probabilities[batch_idx].append(prob[label_id])
+            tags[batch_idx].append((self.id_to_label[label_id], (start, end)))
+            probabilities[batch_idx].append(prob)
 
         return [{"tags": t, "probabilities": p} for t, p in zip(tags, probabilities)]
 
@@ -302,6 +368,8 @@ class TransformerSpanClassificationTaskModule(TaskModuleType):
             task_encoding.targets for task_encoding in task_encodings
         ]
 
-        inputs = {k: torch.tensor(v, dtype=torch.int64) for k, v in inputs.items()}
+        # the padded inputs are already tensors, so we just make sure of the dtype
+        # (this does not copy them if they are already int64)
+        inputs = {k: v.to(dtype=torch.int64) for k, v in inputs.items()}
 
         return inputs, targets
@@ -24,7 +24,7 @@ from typing import (
 
 import numpy as np
 import torch
-from transformers import AutoTokenizer
+from transformers import AutoTokenizer, BatchEncoding
 from transformers.file_utils import PaddingStrategy
 from transformers.tokenization_utils_base import TruncationStrategy
 from typing_extensions import TypeAlias
@@ -133,9 +133,7 @@ class TransformerTextClassificationTaskModule(TaskModuleType):
         labels = set()
         for document in documents:
             annotations: Sequence[Label] = document[self.annotation]
-
-            for annotation in annotations:
-                labels.add(annotation.label)
+            labels.update(annotation.label for annotation in annotations)
 
         self.label_to_id["O"] = 0
         current_id = 1
@@ -145,12 +143,9 @@ class TransformerTextClassificationTaskModule(TaskModuleType):
 
         self.id_to_label = {v: k for k, v in self.label_to_id.items()}
 
-    def encode_input(
-        self,
-        document: TextDocument,
-    ) -> Optional[Union[TaskEncodingType, Sequence[TaskEncodingType]]]:
-        inputs = self.tokenizer(
-            document.text,
+    def _tokenize(self, documents_and_texts: List[Tuple[TextDocument, str]]) -> BatchEncoding:
+        return self.tokenizer(
+            [text for _, text in documents_and_texts],
             padding=False,
             truncation=self.truncation,
             max_length=self.max_length,
@@ -159,17 +154,57 @@ class TransformerTextClassificationTaskModule(TaskModuleType):
             return_special_tokens_mask=True,
         )
 
+    def _create_task_encodings(
+        self,
+        document: TextDocument,
+        texts: Sequence[str],
+        batch_encoding: BatchEncoding,
+        first_batch_index: int,
+    ) -> List[TaskEncodingType]:
+        inputs = {key: values[first_batch_index] for key, values in batch_encoding.items()}
         metadata = {
             "offset_mapping": inputs.pop("offset_mapping"),
             "special_tokens_mask": inputs.pop("special_tokens_mask"),
         }
 
-        return TaskEncoding(
-            document=document,
-            inputs=inputs,
-            metadata=metadata,
+        return [
+            TaskEncoding(
+                document=document,
+                inputs=inputs,
+                metadata=metadata,
+            )
+        ]
+
+    def encode_inputs(
+        self,
+        documents: Sequence[TextDocument],
+        show_progress: bool = False,
+    ) -> Tuple[Sequence[TaskEncodingType], Sequence[TextDocument]]:
+        if self._encode_input_is_overridden():
+            return super().encode_inputs(documents, show_progress=show_progress)
+        return self._encode_documents(documents, show_progress=show_progress)
+
+    def _encode_documents(
+        self,
+        documents: Sequence[TextDocument],
+        show_progress: bool = False,
+    ) -> Tuple[List[TaskEncodingType], List[TextDocument]]:
+        # each document is classified as a whole, so its text is the only item to tokenize
+        return self._encode_inputs_batched(
+            documents,
+            get_items=lambda document: [document.text],
+            process_items=self._tokenize,
+            create_task_encodings=self._create_task_encodings,
+            show_progress=show_progress,
         )
 
+    def encode_input(
+        self,
+        document: TextDocument,
+    ) -> Optional[Union[TaskEncodingType, Sequence[TaskEncodingType]]]:
+        task_encodings, _ = self._encode_documents([document])
+        return task_encodings[0]
+
     def encode_target(
         self,
         task_encoding: TaskEncodingType,
@@ -195,20 +230,20 @@ class TransformerTextClassificationTaskModule(TaskModuleType):
     def unbatch_output(self, model_output: ModelOutputType) -> Sequence[TaskOutputType]:
         logits = model_output["logits"]
 
-        output_label_probs = logits.sigmoid() if self.multi_label else logits.softmax(dim=-1)
-        output_label_probs = output_label_probs.detach().cpu().float().numpy()
-
         if self.multi_label:
             raise NotImplementedError()
 
         else:
+            # the task output holds only the top label of each document and its probability,
+            # i.e. softmax(logits)[max_label_ids], so we compute just that and not the full softmax
+            max_logits, max_label_ids = logits.max(dim=-1)
+            max_probs = torch.exp(max_logits - torch.logsumexp(logits, dim=-1))
             unbatched_output = []
-            label_ids = np.argmax(output_label_probs, axis=-1)
-            for batch_idx, label_id in enumerate(label_ids):
-                label = self.id_to_label[label_id]
-                prob = float(output_label_probs[batch_idx, label_id])
+            for label_id, prob in zip(
+                max_label_ids.detach().cpu().tolist(), max_probs.detach().cpu().float().tolist()
+            ):
                 result: TaskOutputSingleType = {
-                    "labels": [label],
+                    "labels": [self.id_to_label[label_id]],
                     "probabilities": [prob],
                 }
 
@@ -254,9 +289,15 @@ class TransformerTextClassificationTaskModule(TaskModuleType):
             task_encoding.targets for task_encoding in task_encodings
         ]
 
-        targets = torch.tensor(target_list, dtype=torch.int64)
-
-        if not self.multi_label:
-            targets = targets.flatten()
+        targets: torch.Tensor
+        if self.multi_label:
+            targets = torch.from_numpy(np.asarray(target_list, dtype=np.int64))
+        else:
+            # each target holds exactly one label id, so we collect them into a flat array directly
+            targets = torch.from_numpy(
+                np.fromiter(
+                    (target[0] for target in target_list), dtype=np.int64, count=len(target_list)
+                )
+            )
 
         return inputs, targets
@@ -7,10 +7,10 @@ workflow:
     -> Document
 """
 
-import copy
 import logging
 from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Type, Union
 
+import numpy as np
 import torch
 import torch.nn.functional as F
 from transformers import AutoTokenizer
@@ -28,8 +28,8 @@ from pytorch_ie.documents import (
 from pytorch_ie.models.transformer_token_classification import ModelOutputType, ModelStepInputType
 from pytorch_ie.utils.span import (
     bio_tags_to_spans,
-    convert_span_annotations_to_tag_sequence,
-    get_char_to_token_mapper,
+    convert_span_annotations_to_tag_ids,
+    get_char_to_token_mapper_from_offsets,
     get_special_token_mask,
     has_overlap,
 )
@@ -83,7 +83,7 @@ class TransformerTokenClassificationTaskModule(TaskModuleType):
         self.entity_annotation = entity_annotation
         self.partition_annotation = partition_annotation
         self.label_to_id = label_to_id or {}
-        self.id_to_label = {v: k for k, v in self.label_to_id.items()}
+        self._update_label_mappings()
         self.padding = padding
         self.truncation = truncation
         self.max_length = max_length
@@ -133,46 +133,111 @@ class TransformerTokenClassificationTaskModule(TaskModuleType):
                 self.label_to_id[f"{prefix}-{label}"] = current_id
                 current_id += 1
 
+        self._update_label_mappings()
+
+    def _update_label_mappings(self) -> None:
+        """Create the mappings that are derived from label_to_id."""
         self.id_to_label = {v: k for k, v in self.label_to_id.items()}
+        # this allows to map all predicted tag ids of a batch to their tags at once
+        self._id_to_label_array = np.empty(max(self.id_to_label, default=-1) + 1, dtype=object)
+        for label_id, label in self.id_to_label.items():
+            self._id_to_label_array[label_id] = label
+        # map each entity label to the ids of its B- and I-tag to not format the tags per span
+        self._label_to_tag_ids: Dict[str, Tuple[int, int]] = {}
+        for tag, tag_id in self.label_to_id.items():
+            if tag.startswith("B-") and f"I-{tag[2:]}" in self.label_to_id:
+                self._label_to_tag_ids[tag[2:]] = (tag_id, self.label_to_id[f"I-{tag[2:]}"])
+
+    def _get_partitions(self, document: TextDocument) -> Sequence[Optional[Span]]:
+        if self.partition_annotation is not None:
+            return document[self.partition_annotation]
+        else:
+            return [None]
 
-    def encode_text(
-        self, text, partition: Optional[Span] = None, add_special_tokens: bool = True
+    def _tokenize_partitions(
+        self, documents_and_partitions: Sequence[Tuple[TextDocument, Optional[Span]]]
     ) -> BatchEncoding:
-        if self.partition_annotation is not None and partition is None:
+        """Tokenize the text partitions with a single tokenizer call. A partition of None means
+        the whole text."""
+        if self.partition_annotation is not None and any(
+            partition is None for _, partition in documents_and_partitions
+        ):
             raise ValueError(f"partitioning is enabled, but no partition is provided")
 
-        text_partition = text[partition.start : partition.end] if partition is not None else text
         return self.tokenizer(
-            text_partition,
+            [
+                (
+                    document.text[partition.start : partition.end]
+                    if partition is not None
+                    else document.text
+                )
+                for document, partition in documents_and_partitions
+            ],
             padding=False,
             truncation=False,
             max_length=None,
             is_split_into_words=False,
             return_offsets_mapping=True,
             return_special_tokens_mask=True,
-            add_special_tokens=add_special_tokens,
+            add_special_tokens=self.max_window is None,
+        )
+
+    def encode_inputs(
+        self,
+        documents: Sequence[TextDocument],
+        show_progress: bool = False,
+    ) -> Tuple[Sequence[TaskEncodingType], Sequence[TextDocument]]:
+        if self._encode_input_is_overridden():
+            return super().encode_inputs(documents, show_progress=show_progress)
+        return self._encode_documents(documents, show_progress=show_progress)
+
+    def _encode_documents(
+        self,
+        documents: Sequence[TextDocument],
+        show_progress: bool = False,
+    ) -> Tuple[List[TaskEncodingType], List[TextDocument]]:
+        # the partitions of all documents are tokenized together, windowing is applied afterwards
+        return self._encode_inputs_batched(
+            documents,
+            get_items=self._get_partitions,
+            process_items=self._tokenize_partitions,
+            create_task_encodings=self._encode_partitions,
+            show_progress=show_progress,
         )
 
     def encode_input(
         self,
         document: TextDocument,
     ) -> Optional[Union[TaskEncodingType, Sequence[TaskEncodingType]]]:
-        partitions: Sequence[Optional[Span]]
-        if self.partition_annotation is not None:
-            partitions = document[self.partition_annotation]
-        else:
-            partitions = [None]
+        task_encodings, _ = self._encode_documents([document])
+        return task_encodings
 
+    def _encode_partitions(
+        self,
+        document: TextDocument,
+        partitions: Sequence[Optional[Span]],
+        batch_encoding: BatchEncoding,
+        first_batch_index: int,
+    ) -> List[TaskEncodingType]:
+        """Create the task encodings for the partitions of the document. The partition texts are
+        expected to be tokenized in batch_encoding, starting at first_batch_index."""
         task_encodings: List[TaskEncodingType] = []
         for partition_index, partition in enumerate(partitions):
-            add_special_tokens = self.max_window is None
-            inputs: BatchEncoding = self.encode_text(
-                text=document.text, partition=partition, add_special_tokens=add_special_tokens
+            batch_index = first_batch_index + partition_index
+            # this keeps the underlying encoding (of fast tokenizers), so char_to_token() works as usual
+            inputs = BatchEncoding(
+                data={key: values[batch_index] for key, values in batch_encoding.items()},
+                encoding=(
+                    batch_encoding.encodings[batch_index]
+                    if batch_encoding.encodings is not None
+                    else None
+                ),
             )
 
+            # keep the offsets and the special tokens mask as compact arrays instead of python lists
             metadata = {
-                "offset_mapping": inputs.pop("offset_mapping"),
-                "special_tokens_mask": inputs.pop("special_tokens_mask"),
+                "offset_mapping": np.asarray(inputs.pop("offset_mapping"), dtype=np.int32),
+                "special_tokens_mask": np.asarray(inputs.pop("special_tokens_mask"), dtype=bool),
                 "char_to_token_mapper": inputs.char_to_token,
             }
 
@@ -200,40 +265,39 @@ class TransformerTokenClassificationTaskModule(TaskModuleType):
                     new_input_ids = self.tokenizer.build_inputs_with_special_tokens(
                         token_ids_0=token_ids[start_idx:end_idx]
                     )
-                    new_special_tokens_mask = get_special_token_mask(
-                        token_ids_0=new_input_ids, tokenizer=self.tokenizer
+                    new_special_tokens_mask = np.asarray(
+                        get_special_token_mask(
+                            token_ids_0=new_input_ids, tokenizer=self.tokenizer
+                        ),
+                        dtype=bool,
                     )
                     window_inputs = {"input_ids": new_input_ids}
-                    # for now, we copy just to keep "sentence_index"
-                    window_metadata = copy.deepcopy(metadata)
+                    # for now, we copy just to keep "sentence_index". A shallow copy is sufficient
+                    # because all other entries are replaced below. Note that a deep copy would also
+                    # copy the whole (partition) encoding that is bound to the char_to_token_mapper.
+                    window_metadata = dict(metadata)
                     window_metadata["special_tokens_mask"] = new_special_tokens_mask
                     offset_mapping_without_special_tokens = offset_mapping[start_idx:end_idx]
-                    j = 0
-                    current_offset_mapping: List[Tuple[int, int]] = []
                     # this maps from positions without special tokens to positions with special tokens
-                    position_with_special_tokens = {}
-                    for i, is_special_token in enumerate(new_special_tokens_mask):
-                        if is_special_token:
-                            current_offset_mapping.append((0, 0))
-                        else:
-                            position_with_special_tokens[j] = i
-                            current_offset_mapping.append(offset_mapping_without_special_tokens[j])
-                            j += 1
+                    position_with_special_tokens = np.flatnonzero(~new_special_tokens_mask)
+                    # special tokens get the offsets (0, 0)
+                    current_offset_mapping = np.zeros((len(new_input_ids), 2), dtype=np.int32)
+                    current_offset_mapping[position_with_special_tokens] = (
+                        offset_mapping_without_special_tokens
+                    )
                     window_metadata["offset_mapping"] = current_offset_mapping
-                    char_to_token_mapping: Dict[int, int] = {}
-                    for token_idx, (char_start, char_end) in enumerate(current_offset_mapping):
-                        for char_idx in range(char_start, char_end):
-                            char_to_token_mapping[char_idx] = token_idx
-                    window_metadata["char_to_token_mapper"] = get_char_to_token_mapper(
-                        char_to_token_mapping=char_to_token_mapping,
-                        char_start=offset_mapping_without_special_tokens[0][0],
-                        char_end=offset_mapping_without_special_tokens[-1][1],
+                    window_metadata["char_to_token_mapper"] = (
+                        get_char_to_token_mapper_from_offsets(
+                            offset_mapping=current_offset_mapping,
+                            char_start=int(offset_mapping_without_special_tokens[0, 0]),
+                            char_end=int(offset_mapping_without_special_tokens[-1, 1]),
+                        )
                     )
                     # new_metadata["window_tokens"] = token_slice
                     window_metadata["window_labels"] = (
-                        position_with_special_tokens[label_offset_slice[0]],
+                        int(position_with_special_tokens[label_offset_slice[0]]),
                         # we have to look up the actual index, not the pythonic end position
-                        position_with_special_tokens[label_offset_slice[1] - 1] + 1,
+                        int(position_with_special_tokens[label_offset_slice[1] - 1]) + 1,
                     )
 
                     task_encodings.append(
@@ -260,39 +324,40 @@ class TransformerTokenClassificationTaskModule(TaskModuleType):
             partition_index = metadata["sentence_index"]
             partitions = document[self.partition_annotation]
             partition = partitions[partition_index]
-        tag_sequence_or_none = convert_span_annotations_to_tag_sequence(
+        tag_ids_or_none = convert_span_annotations_to_tag_ids(
             spans=entities,
             special_tokens_mask=metadata["special_tokens_mask"],
             char_to_token_mapper=metadata["char_to_token_mapper"],
+            label_to_tag_ids=self._label_to_tag_ids,
+            outside_id=self.label_to_id["O"],
+            pad_id=self.label_pad_token_id,
             partition=partition,
             statistics=None,
         )
-        if tag_sequence_or_none is None:
+        if tag_ids_or_none is None:
             logger.warning(
                 f"can not create targets for document with id: {getattr(document, 'id', None)}, skip it"
             )
             return None
         else:
-            tag_sequence = tag_sequence_or_none
+            tag_ids = tag_ids_or_none
 
         # exclude labels that are out of the window (when overlap is used)
         window_labels = metadata.get("window_labels")
         if window_labels is not None:
-            tag_sequence[0 : window_labels[0]] = [None] * window_labels[0]
-            tag_sequence[window_labels[1] :] = [None] * len(tag_sequence[window_labels[1] :])
+            tag_ids[0 : window_labels[0]] = self.label_pad_token_id
+            tag_ids[window_labels[1] :] = self.label_pad_token_id
 
-        targets = [
-            self.label_to_id[tag] if tag is not None else self.label_pad_token_id
-            for tag in tag_sequence
-        ]
+        targets = tag_ids.tolist()
 
         return targets
 
     def unbatch_output(self, model_output: ModelOutputType) -> Sequence[TaskOutputType]:
-        logits = model_output["logits"]
-        probabilities = F.softmax(logits, dim=-1).detach().cpu().float().numpy()
-        indices = torch.argmax(logits, dim=-1).detach().cpu().numpy()
-        tags = [[self.id_to_label[e] for e in b] for b in indices]
+        logits = model_output["logits"].detach()
+        # compute the softmax in fp32, also for half precision logits, without upcasting them first
+        probabilities = F.softmax(logits, dim=-1, dtype=torch.float32).cpu().numpy()
+        indices = torch.argmax(logits, dim=-1).cpu().numpy()
+        tags = self._id_to_label_array[indices].tolist()
         return [{"tags": t, "probabilities": p} for t, p in zip(tags, probabilities)]
 
     def create_annotations_from_output(
@@ -300,33 +365,35 @@ class TransformerTokenClassificationTaskModule(TaskModuleType):
         task_encoding: TaskEncodingType,
         task_output: TaskOutputType,
     ) -> Iterator[Tuple[str, LabeledSpan]]:
+        # look up the metadata once and not per span
+        metadata = task_encoding.metadata
+        offset_mapping = metadata["offset_mapping"]
+        window_labels = metadata.get("window_labels")
         offset = 0
         if self.partition_annotation is not None:
             partitions = task_encoding.document[self.partition_annotation]
-            offset = partitions[task_encoding.metadata["sentence_index"]].start
+            offset = partitions[metadata["sentence_index"]].start
 
         tag_sequence = [
             "O" if is_special_token else tag
-            for tag, is_special_token in zip(
-                task_output["tags"], task_encoding.metadata["special_tokens_mask"]
-            )
+            for tag, is_special_token in zip(task_output["tags"], metadata["special_tokens_mask"])
         ]
 
         spans = bio_tags_to_spans(
             tag_sequence, include_ill_formed=self.include_ill_formed_predictions
         )
         for label, (start, end) in spans:
-            if "window_labels" in task_encoding.metadata:
+            if window_labels is not None:
                 # Take only spans into account that are at least partly in the window. The model was not
                 # trained to correctly predict spans that are just in the context.
                 # NOTE: The "end" index is exclusive, but encoding.metadata["window_labels"][1] is inclusive!
-                if not has_overlap((start, end + 1), task_encoding.metadata["window_labels"]):
+                if not has_overlap((start, end + 1), window_labels):
                     continue
             yield (
                 self.entity_annotation,
                 LabeledSpan(
-                    task_encoding.metadata["offset_mapping"][start][0] + offset,
-                    task_encoding.metadata["offset_mapping"][end][1] + offset,
+                    int(offset_mapping[start, 0]) + offset,
+                    int(offset_mapping[end, 1]) + offset,
                     label,
                 ),
             )
@@ -350,18 +417,17 @@ class TransformerTokenClassificationTaskModule(TaskModuleType):
         ]
 
         sequence_length = inputs["input_ids"].shape[1]
-        padding_side = self.tokenizer.padding_side
-        if padding_side == "right":
-            target_list_padded = [
-                list(t) + [self.label_pad_token_id] * (sequence_length - len(t))
-                for t in target_list
-            ]
-        else:
-            target_list_padded = [
-                [self.label_pad_token_id] * (sequence_length - len(t)) + list(t)
-                for t in target_list
-            ]
+        # fill a preallocated array instead of creating padded python lists that need to be converted
+        targets_array = np.full(
+            (len(target_list), sequence_length), fill_value=self.label_pad_token_id, dtype=np.int64
+        )
+        pad_left = self.tokenizer.padding_side == "left"
+        for idx, target in enumerate(target_list):
+            if pad_left:
+                targets_array[idx, sequence_length - len(target) :] = target
+            else:
+                targets_array[idx, : len(target)] = target
 
-        targets = torch.tensor(target_list_padded, dtype=torch.int64)
+        targets = torch.from_numpy(targets_array)
 
         return inputs, targets
@@ -1,4 +1,5 @@
 import functools
+import itertools
 import logging
 from typing import (
     Callable,
@@ -13,6 +14,7 @@ from typing import (
     Tuple,
 )
 
+import numpy as np
 from transformers import PreTrainedTokenizer
 
 from pytorch_ie.annotations import LabeledSpan, Span
@@ -210,6 +212,61 @@ def convert_span_annotations_to_tag_sequence(
     return tag_sequence
 
 
+def convert_span_annotations_to_tag_ids(
+    spans: Sequence[LabeledSpan],
+    special_tokens_mask: Sequence[int],
+    char_to_token_mapper: Callable[[int], Optional[int]],
+    label_to_tag_ids: Dict[str, Tuple[int, int]],
+    outside_id: int,
+    pad_id: int,
+    partition: Optional[Span] = None,
+    statistics: Optional[DefaultDict[str, Counter]] = None,
+) -> Optional[np.ndarray]:
+    """
+    Same as convert_span_annotations_to_tag_sequence, but directly creates an array of tag ids instead
+    of a list of tag strings. label_to_tag_ids maps each span label to the ids of its B- and I-tag,
+    outside_id is used for the O-tag and pad_id for special token positions. The tags of each span are
+    assigned with slice operations instead of token by token.
+    Note: The spans are not allowed to overlap (None is returned in this case).
+    """
+    tag_ids = np.where(np.asarray(special_tokens_mask, dtype=bool), pad_id, outside_id)
+    # positions that are already covered by a span, used to detect overlaps
+    tagged = np.zeros(len(tag_ids), dtype=bool)
+    offset = partition.start if partition is not None else 0
+    for span in spans:
+        if partition is not None and (span.start < partition.start or span.end > partition.end):
+            continue
+
+        start_idx = char_to_token_mapper(span.start - offset)
+        end_idx = char_to_token_mapper(span.end - 1 - offset)
+        if start_idx is None or end_idx is None:
+            if statistics is not None:
+                statistics["skipped_unaligned"][span.label] += 1
+            else:
+                logger.warning(
+                    f"Entity annotation does not start or end with a token, it will be skipped: {span}"
+                )
+            continue
+
+        # negative numbers encode out-of-window tokens
+        if start_idx < 0 or end_idx < 0:
+            continue
+
+        if end_idx >= start_idx:
+            if tagged[start_idx : end_idx + 1].any():
+                logger.warning(f"tag already assigned (current span has an overlap: {span}).")
+                return None
+            begin_id, inside_id = label_to_tag_ids[span.label]
+            tag_ids[start_idx : end_idx + 1] = inside_id
+            tag_ids[start_idx] = begin_id
+            tagged[start_idx : end_idx + 1] = True
+
+        if statistics is not None:
+            statistics["added"][span.label] += 1
+
+    return tag_ids
+
+
 def get_token_slice(
     character_slice: Tuple[int, int],
     char_to_token_mapper: Callable[[int], Optional[int]],
@@ -267,6 +324,44 @@ def get_char_to_token_mapper(
     )
 
 
+def _char_to_token_array_mapper(
+    char_idx: int,
+    char_to_token_array: np.ndarray,
+    char_start: int,
+    char_end: int,
+) -> Optional[int]:
+    if char_idx < char_start:
+        # return negative number to encode out-ot-window
+        return -1
+    if char_idx >= char_end:
+        # return negative number to encode out-ot-window
+        return -2
+    token_idx = char_to_token_array[char_idx - char_start]
+    return int(token_idx) if token_idx >= 0 else None
+
+
+def get_char_to_token_mapper_from_offsets(
+    offset_mapping: np.ndarray,
+    char_start: int,
+    char_end: int,
+) -> Callable[[int], Optional[int]]:
+    """
+    Same as get_char_to_token_mapper, but the mapping is created from the token offsets (an array of shape
+    (num_tokens, 2)) and stored as an array over the characters from char_start to char_end instead of as
+    a dict. Characters that are not covered by any token are mapped to None.
+    """
+    char_to_token_array = np.full(char_end - char_start, -1, dtype=np.int32)
+    for token_idx, (token_start, token_end) in enumerate(offset_mapping.tolist()):
+        # this is a no-op for special tokens because their offsets are (0, 0)
+        char_to_token_array[token_start - char_start : token_end - char_start] = token_idx
+    return functools.partial(
+        _char_to_token_array_mapper,
+        char_to_token_array=char_to_token_array,
+        char_start=char_start,
+        char_end=char_end,
+    )
+
+
 def get_special_token_mask(token_ids_0: List[int], tokenizer: PreTrainedTokenizer) -> List[int]:
     # TODO: check why we can not just use tokenizer.get_special_tokens_mask()
     #  (this checks if token_ids_1 is not None and raises an exception)
@@ -279,20 +374,16 @@ def get_special_token_mask(token_ids_0: List[int], tokenizer: PreTrainedTokenize
 def tokens_and_tags_to_text_and_labeled_spans(
     tokens: Sequence[str], tags: Sequence[str]
 ) -> Tuple[str, Sequence[LabeledSpan]]:
-    start = 0
-    token_offsets: List[Tuple[int, int]] = []
-    for token in tokens:
-        end = start + len(token)
-        token_offsets.append((start, end))
-        # we add a space after each token
-        start = end + 1
+    # token_starts[i] is the start offset of the i-th token and, because we add a space after each
+    # token, token_starts[i + 1] - 1 is its end offset
+    token_starts = list(itertools.accumulate((len(token) + 1 for token in tokens), initial=0))
 
     text = " ".join(tokens)
 
     spans: List[LabeledSpan] = []
     for label, (start, end) in bio_tags_to_spans(tags):
         spans.append(
-            LabeledSpan(start=token_offsets[start][0], end=token_offsets[end][1], label=label)
+            LabeledSpan(start=token_starts[start], end=token_starts[end + 1] - 1, label=label)
         )
 
     return text, spans
@@ -196,3 +196,155 @@ def test_validation_step(mock_model, batch):
 def test_test_step(mock_model, batch):
     loss = mock_model.test_step(batch, batch_idx=0)
     torch.testing.assert_close(loss, LOSS)
+
+
+class MockModule(torch.nn.Module):
+    def __init__(self) -> None:
+        super().__init__()
+        self.linear = torch.nn.Linear(4, 4)
+
+
+def test_quantization(monkeypatch):
+    monkeypatch.setattr(
+        transformers.AutoModelForSeq2SeqLM,
+        "from_pretrained",
+        lambda pretrained_model_name_or_path: MockModule(),
+    )
+
+    model = TransformerSeq2SeqModel(model_name_or_path="some-model-name", quantization="int8")
+    assert model.hparams.quantization == "int8"
+    assert isinstance(model.model.linear, torch.ao.nn.quantized.dynamic.Linear)
+
+
+def test_quantization_on_cuda(monkeypatch, batch):
+    monkeypatch.setattr(
+        transformers.AutoModelForSeq2SeqLM,
+        "from_pretrained",
+        lambda pretrained_model_name_or_path: MockModule(),
+    )
+    model = TransformerSeq2SeqModel(model_name_or_path="some-model-name", quantization="int8")
+    # simulate that the model was moved to a CUDA device
+    monkeypatch.setattr(model, "_device", torch.device("cuda", 0))
+
+    with pytest.raises(
+        ValueError, match="int8 quantization is only supported on CPU, but the model is on"
+    ):
+        model.predict(inputs=batch[0].data)
+
+
+@pytest.mark.parametrize(
+    "precision, dtype",
+    [("fp32", torch.float32), ("fp16", torch.float16), ("bf16", torch.bfloat16)],
+)
+def test_precision(monkeypatch, precision, dtype):
+    monkeypatch.setattr(
+        transformers.AutoModelForSeq2SeqLM,
+        "from_pretrained",
+        lambda pretrained_model_name_or_path: MockModule(),
+    )
+
+    model = TransformerSeq2SeqModel(model_name_or_path="some-model-name", precision=precision)
+    assert model.hparams.precision == precision
+    assert model.model.linear.weight.dtype == dtype
+
+
+def test_precision_unknown():
+    with pytest.raises(ValueError, match="unknown precision: fp8"):
+        TransformerSeq2SeqModel(model_name_or_path="some-model-name", precision="fp8")
+
+
+def test_quantization_unknown():
+    with pytest.raises(ValueError, match="unknown quantization mode: int4"):
+        TransformerSeq2SeqModel(model_name_or_path="some-model-name", quantization="int4")
+
+
+def test_predict_backend_unknown():
+    with pytest.raises(ValueError, match="unknown predict backend: ctranslate2"):
+        TransformerSeq2SeqModel(
+            model_name_or_path="some-model-name", predict_backend="ctranslate2"
+        )
+
+
+def test_predict_backend_onnxruntime(mock_model, batch, monkeypatch):
+    class MockOnnxRuntimeModel:
+        def generate(self, **kwargs):
+            assert "labels" not in kwargs
+            return TOKEN_IDS
+
+    mock_model.predict_backend = "onnxruntime"
+    monkeypatch.setattr(mock_model, "get_onnxruntime_model", lambda: MockOnnxRuntimeModel())
+    prediction = mock_model.predict(inputs=batch[0].data)
+    torch.testing.assert_close(prediction, TOKEN_IDS)
+
+
+@pytest.mark.parametrize(
+    "quantization, precision", [("int8", "fp32"), (None, "fp16"), (None, "bf16")]
+)
+def test_predict_backend_onnxruntime_with_quantization_or_precision(quantization, precision):
+    with pytest.raises(
+        ValueError,
+        match="the onnxruntime predict backend can not be combined with quantization or a precision",
+    ):
+        TransformerSeq2SeqModel(
+            model_name_or_path="some-model-name",
+            predict_backend="onnxruntime",
+            quantization=quantization,
+            precision=precision,
+        )
+
+
+def test_predict_backend_onnxruntime_export(monkeypatch):
+    pytest.importorskip("optimum.onnxruntime")
+    config = transformers.T5Config(
+        vocab_size=100,
+        d_model=16,
+        d_kv=4,
+        d_ff=32,
+        num_layers=1,
+        num_heads=2,
+        decoder_start_token_id=0,
+        pad_token_id=0,
+        eos_token_id=1,
+    )
+    torch.manual_seed(42)
+    t5_model = transformers.T5ForConditionalGeneration(config).eval()
+    monkeypatch.setattr(
+        transformers.AutoModelForSeq2SeqLM,
+        "from_pretrained",
+        lambda pretrained_model_name_or_path: t5_model,
+    )
+    model = TransformerSeq2SeqModel(
+        model_name_or_path="some-model-name", predict_backend="onnxruntime"
+    )
+    inputs = {
+        "input_ids": torch.randint(2, 100, (2, 6)),
+        "attention_mask": torch.ones(2, 6, dtype=torch.long),
+    }
+
+    prediction = model.predict(inputs=inputs, max_new_tokens=5, do_sample=False)
+
+    expected = t5_model.generate(**inputs, max_new_tokens=5, do_sample=False)
+    torch.testing.assert_close(prediction, expected)
+    # the export is cached
+    assert model.get_onnxruntime_model() is model.get_onnxruntime_model()
+
+
+def test_predict_with_precision(monkeypatch, batch):
+    class MockModelWithDtype(MockModel):
+        def to(self, dtype):
+            return self
+
+        def generate(self, **kwargs):
+            # matmuls are executed in bfloat16 when autocast is enabled
+            assert torch.mm(torch.ones(2, 2), torch.ones(2, 2)).dtype == torch.bfloat16
+            return TOKEN_IDS
+
+    monkeypatch.setattr(
+        transformers.AutoModelForSeq2SeqLM,
+        "from_pretrained",
+        lambda pretrained_model_name_or_path: MockModelWithDtype(),
+    )
+    model = TransformerSeq2SeqModel(model_name_or_path="some-model-name", precision="bf16")
+
+    prediction = model.predict(inputs=batch[0].data)
+    torch.testing.assert_close(prediction, TOKEN_IDS)
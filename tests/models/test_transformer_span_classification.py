@@ -165,3 +165,19 @@ def test_start_end_and_span_length_span_index(mock_model, seq_lengths):
         assert torch.equal(span_length, torch.tensor([0, 0, 0, 1, 1, 0, 0, 0, 0, 1, 1, 1]))
         assert torch.equal(batch_indices, torch.tensor([0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 1]))
         assert torch.equal(offsets, torch.tensor([0, 0, 0, 0, 0, 4, 4, 4, 4, 4, 4, 4]))
+
+
+@pytest.mark.parametrize("seq_lengths", [None, [3, 4]])
+def test_expand_target_tuples(mock_model, seq_lengths):
+    target = mock_model._expand_target_tuples(
+        # the last tuple of the second entry is longer than max_span_length=2, so it gets ignored
+        target_tuples=[[(0, 1, 2), (2, 2, 1)], [(3, 3, 4), (0, 0, 1), (1, 3, 3)]],
+        batch_size=2,
+        max_seq_length=4,
+        seq_lengths=seq_lengths,
+    )
+
+    if seq_lengths is None:
+        assert torch.equal(target, torch.tensor([0, 0, 1, 0, 2, 0, 0, 1, 0, 0, 4, 0, 0, 0]))
+    else:
+        assert torch.equal(target, torch.tensor([0, 0, 1, 2, 0, 1, 0, 0, 4, 0, 0, 0]))
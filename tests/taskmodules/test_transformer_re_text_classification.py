@@ -5,6 +5,8 @@ import numpy
 import pytest
 import torch
 
+from pytorch_ie.annotations import LabeledSpan
+from pytorch_ie.core import TaskEncoding
 from pytorch_ie.taskmodules import TransformerRETextClassificationTaskModule
 
 
@@ -565,6 +567,19 @@ def test_unbatch_output(prepared_taskmodule, model_output):
         assert output["probabilities"] == pytest.approx([probability])
 
 
+def test_create_annotations_from_output_unsupported_candidate(prepared_taskmodule, documents):
+    task_encoding = TaskEncoding(
+        document=documents[0],
+        inputs={},
+        metadata={"candidate_annotation": LabeledSpan(start=0, end=4, label="PER")},
+    )
+    # the candidate type is also checked for candidates that are predicted with the none label
+    task_output = {"labels": [prepared_taskmodule.none_label], "probabilities": [0.5]}
+
+    with pytest.raises(NotImplementedError, match="candidate_annotation has the type"):
+        list(prepared_taskmodule.create_annotations_from_output(task_encoding, task_output))
+
+
 @pytest.mark.parametrize("inplace", [False, True])
 def test_decode(prepared_taskmodule, documents, model_output, inplace):
     documents = [documents[i] for i in [0, 1, 4]]
@@ -758,3 +773,66 @@ def test_encode_with_windowing(documents):
         ".",
         "[SEP]",
     ]
+
+
+# (document index, tokens) per task encoding
+ENCODE_INPUTS_BATCHED_EXPECTED = {
+    None: [
+        (1, "[CLS] [H] Entity A [/H] works at [T] B [/T] . [SEP]"),
+        (
+            4,
+            "[CLS] First sentence . [H] Entity G [/H] works at [T] H [/T] . And founded I . [SEP]",
+        ),
+        (
+            4,
+            "[CLS] First sentence . [H] Entity G [/H] works at H . And founded [T] I [/T] . [SEP]",
+        ),
+        (
+            4,
+            "[CLS] First sentence . Entity G works at [T] H [/T] . And founded [H] I [/H] . [SEP]",
+        ),
+        (
+            7,
+            "[CLS] First sentence . [H] Entity M [/H] works at [T] N [/T] . And it founded O . [SEP]",
+        ),
+        (
+            7,
+            "[CLS] First sentence . Entity M works at N . And [H] it [/H] founded [T] O [/T] . [SEP]",
+        ),
+        (
+            7,
+            "[CLS] First sentence . Entity M works at N . And [T] it [/T] founded [H] O [/H] . [SEP]",
+        ),
+    ],
+    "sentences": [
+        (1, "[CLS] [H] Entity A [/H] works at [T] B [/T] . [SEP]"),
+        (4, "[CLS] [H] Entity G [/H] works at [T] H [/T] . [SEP]"),
+        (7, "[CLS] [H] Entity M [/H] works at [T] N [/T] . [SEP]"),
+        (7, "[CLS] And [H] it [/H] founded [T] O [/T] [SEP]"),
+        (7, "[CLS] And [T] it [/T] founded [H] O [/H] [SEP]"),
+    ],
+}
+
+
+@pytest.mark.parametrize("partition_annotation", [None, "sentences"])
+def test_encode_inputs_batched(documents, partition_annotation):
+    taskmodule = TransformerRETextClassificationTaskModule(
+        tokenizer_name_or_path="bert-base-cased",
+        relation_annotation="relations",
+        partition_annotation=partition_annotation,
+    )
+    taskmodule.prepare(documents)
+
+    # encode_inputs tokenizes all documents at once
+    task_encodings, documents_in_order = taskmodule.encode_inputs(documents)
+    assert documents_in_order == documents
+    encoded = [
+        (
+            documents.index(task_encoding.document),
+            " ".join(
+                taskmodule.tokenizer.convert_ids_to_tokens(task_encoding.inputs["input_ids"])
+            ),
+        )
+        for task_encoding in task_encodings
+    ]
+    assert encoded == ENCODE_INPUTS_BATCHED_EXPECTED[partition_annotation]
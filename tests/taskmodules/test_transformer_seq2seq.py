@@ -384,3 +384,35 @@ def test_collate(batch):
     torch.testing.assert_close(batch_encoding.input_ids, encoding_expected.input_ids)
     torch.testing.assert_close(batch_encoding.attention_mask, encoding_expected.attention_mask)
     torch.testing.assert_close(batch_encoding.labels, encoding_expected.labels)
+
+
+@pytest.mark.parametrize("padding_side", ["right", "left"])
+@pytest.mark.parametrize(
+    "padding, pad_to_multiple_of, max_length",
+    [(True, None, None), ("longest", 8, None), ("max_length", None, 64), ("max_length", 8, 60)],
+)
+def test_pad_features(padding, pad_to_multiple_of, max_length, padding_side):
+    # _pad_features should produce the same result as tokenizer.pad which it replaces
+    taskmodule = TransformerSeq2SeqTaskModule(
+        tokenizer_name_or_path="Babelscape/rebel-large",
+        padding=padding,
+        pad_to_multiple_of=pad_to_multiple_of,
+    )
+    taskmodule.tokenizer.padding_side = padding_side
+    encodings = [
+        taskmodule.encode_text(text) for text in ["A short text.", "A slightly longer text here."]
+    ]
+    features = {key: [encoding[key] for encoding in encodings] for key in encodings[0].keys()}
+
+    padded = taskmodule._pad_features(features, max_length=max_length)
+
+    expected = taskmodule.tokenizer.pad(
+        encodings,
+        padding=padding,
+        max_length=max_length,
+        pad_to_multiple_of=pad_to_multiple_of,
+        return_tensors="pt",
+    )
+    assert set(padded) == set(expected)
+    for key in expected:
+        torch.testing.assert_close(padded[key], expected[key])
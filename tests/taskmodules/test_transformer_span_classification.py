@@ -1,4 +1,3 @@
-import numpy
 import pytest
 import torch
 
@@ -24,11 +23,11 @@ def prepared_taskmodule(taskmodule, documents):
     return taskmodule
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def model_output():
     return {
-        "logits": torch.from_numpy(
-            numpy.log(
+        "logits": torch.log(
+            torch.tensor(
                 [
                     # O, ORG, PER
                     [0.5, 0.2, 0.3],
@@ -50,6 +49,7 @@ def test_prepare(taskmodule, documents):
     assert set(taskmodule.label_to_id.keys()) == {"PER", "ORG", "O"}
     assert [taskmodule.id_to_label[i] for i in range(3)] == ["O", "ORG", "PER"]
     assert taskmodule.label_to_id["O"] == 0
+    assert taskmodule._outside_label_ids == [0]
 
 
 def test_config(prepared_taskmodule):
@@ -280,6 +280,82 @@ def test_encode_inputs(task_encodings_without_targets, documents, taskmodule, co
         raise ValueError(f"unknown config: {config}")
 
 
+# (document index, tokens, character span of the non-special tokens, window_labels) per task encoding
+ENCODE_INPUTS_BATCHED_EXPECTED = {
+    "": [
+        (0, "[CLS] mount everest is the highest peak in the world . [SEP]", (0, 47), None),
+        (1, "[CLS] alice loves reading books . bob enjoys playing soccer . [SEP]", (0, 53), None),
+    ],
+    "max_window=8": [
+        (0, "[CLS] mount everest is the highest peak [SEP]", (0, 33), (1, 7)),
+        (0, "[CLS] in the world . [SEP]", (34, 47), (1, 5)),
+        (1, "[CLS] alice loves reading books . bob [SEP]", (0, 30), (1, 7)),
+        (1, "[CLS] enjoys playing soccer . [SEP]", (31, 53), (1, 5)),
+    ],
+    "max_window=8-window_overlap=2": [
+        (0, "[CLS] mount everest is the highest peak [SEP]", (0, 33), (1, 5)),
+        (0, "[CLS] is the highest peak in the [SEP]", (14, 40), (3, 5)),
+        (0, "[CLS] highest peak in the world . [SEP]", (21, 47), (3, 7)),
+        (0, "[CLS] in the world . [SEP]", (34, 47), (3, 5)),
+        (1, "[CLS] alice loves reading books . bob [SEP]", (0, 30), (1, 5)),
+        (1, "[CLS] reading books . bob enjoys playing [SEP]", (12, 45), (3, 5)),
+        (1, "[CLS] . bob enjoys playing soccer . [SEP]", (25, 53), (3, 7)),
+        (1, "[CLS] enjoys playing soccer . [SEP]", (31, 53), (3, 5)),
+    ],
+    # the offsets are relative to the partition
+    "partition_annotation=sentences": [
+        (1, "[CLS] bob enjoys playing soccer . [SEP]", (0, 26), None),
+    ],
+}
+
+
+def test_encode_inputs_batched(documents, taskmodule, config_str):
+    # encode_inputs tokenizes all documents at once
+    task_encodings, documents_in_order = taskmodule.encode_inputs(documents)
+    assert documents_in_order == documents
+
+    encoded = []
+    for task_encoding in task_encodings:
+        offset_mapping = task_encoding.metadata["offset_mapping"]
+        non_special = offset_mapping[~task_encoding.metadata["special_tokens_mask"]]
+        encoded.append(
+            (
+                documents.index(task_encoding.document),
+                " ".join(
+                    taskmodule.tokenizer.convert_ids_to_tokens(task_encoding.inputs["input_ids"])
+                ),
+                (int(non_special[0, 0]), int(non_special[-1, 1])),
+                task_encoding.metadata.get("window_labels"),
+            )
+        )
+    assert encoded == ENCODE_INPUTS_BATCHED_EXPECTED[config_str]
+
+
+def test_encode_input_overridden(documents, taskmodule, config):
+    class TaskModuleWithEncodeInput(TransformerTokenClassificationTaskModule):
+        def encode_input(self, document):
+            task_encodings = super().encode_input(document)
+            for task_encoding in task_encodings:
+                task_encoding.metadata["custom"] = True
+            return task_encodings
+
+    custom_taskmodule = TaskModuleWithEncodeInput(
+        tokenizer_name_or_path="bert-base-uncased", entity_annotation="entities", **config
+    )
+    custom_taskmodule.prepare(documents)
+    # the overridden encode_input should not be bypassed by the batched encoding
+    task_encodings, _ = custom_taskmodule.encode_inputs(documents)
+    assert len(task_encodings) == len(taskmodule.encode_inputs(documents)[0])
+    assert all(task_encoding.metadata["custom"] for task_encoding in task_encodings)
+
+
+def test_tokenize_partitions_without_partition(taskmodule, documents, config):
+    if config != {"partition_annotation": "sentences"}:
+        return
+    with pytest.raises(ValueError, match="partitioning is enabled, but no partition is provided"):
+        taskmodule._tokenize_partitions([(documents[0], None)])
+
+
 @pytest.fixture(scope="module")
 def targets(taskmodule, task_encodings_without_targets, config):
     """
@@ -247,6 +247,15 @@ def test_enumerate_dependencies_with_circle():
         _enumerate_dependencies(resolved=resolved, dependency_graph=graph, nodes=root_nodes)
 
 
+def test_enumerate_dependencies_deep_graph():
+    # the dependency chain is longer than the default recursion limit
+    depth = 5000
+    graph = {str(i): [str(i + 1)] for i in range(depth)}
+    resolved = []
+    _enumerate_dependencies(resolved=resolved, dependency_graph=graph, nodes=["0"])
+    assert resolved == [str(i) for i in reversed(range(depth + 1))]
+
+
 def test_annotation_list_wrong_target():
     @dataclasses.dataclass
     class TestDocument(TextDocument):
@@ -305,6 +314,12 @@ def test_annotation_list():
     assert str(document.entities.predictions[0]) == "B"
     assert str(document.entities.predictions[1]) == "Entity A"
 
+    assert entity1 in document.entities
+    assert entity3 not in document.entities
+    assert document.entities.index(entity2) == 1
+    assert document.entities.count(entity1) == 1
+    assert list(reversed(document.entities)) == [entity2, entity1]
+
     document.entities.clear()
     assert len(document.entities) == 0
     assert not entity1.is_attached
@@ -571,6 +586,21 @@ def test_annotation_list_targets():
     )
 
 
+def test_annotation_list_targets_not_shared():
+    @dataclasses.dataclass
+    class TestDocument(Document):
+        text: str
+        entities: AnnotationLayer[LabeledSpan] = annotation_field(target="text")
+
+    doc1 = TestDocument(text="text1")
+    doc2 = TestDocument(text="text2")
+    # the layer construction is cached per document class, but the targets should not be shared
+    assert doc1.entities._targets is not doc2.entities._targets
+    doc1.entities._targets.append("other")
+    assert doc2.entities._targets == ["text"]
+    assert TestDocument(text="text3").entities._targets == ["text"]
+
+
 def test_annotation_compare():
     @dataclasses.dataclass(eq=True, frozen=True)
     class TestAnnotation(Annotation):
@@ -1,9 +1,14 @@
+from collections import UserDict
+
 import pytest
 import torch
 import transformers
 from transformers.modeling_outputs import BaseModelOutputWithPooling
+from transformers.utils import ModelOutput
 
 import pytorch_ie.models.modules.mlp
+import pytorch_ie.pipeline
+from pytorch_ie.core.taskmodule import TaskEncoding
 from pytorch_ie.models.transformer_span_classification import TransformerSpanClassificationModel
 from pytorch_ie.pipeline import Pipeline
 from pytorch_ie.taskmodules.transformer_span_classification import (
@@ -119,3 +124,178 @@ def test_pipeline_with_documents(documents, prepared_taskmodule, mock_model, inp
             assert not (id(returned_document) == id(document))
             assert not document.entities.predictions
             assert returned_document.entities.predictions
+
+
+@pytest.mark.parametrize("pin_memory", [None, True])
+def test_get_dataloader_pin_memory(prepared_taskmodule, mock_model, pin_memory):
+    pipeline = Pipeline(model=mock_model, taskmodule=prepared_taskmodule, device=-1)
+    kwargs = {} if pin_memory is None else {"pin_memory": pin_memory}
+
+    dataloader = pipeline.get_dataloader(model_inputs=[], **kwargs)
+
+    # by default, pinned memory is only used when running on a CUDA device
+    assert dataloader.pin_memory == bool(pin_memory)
+
+
+def test_forward_uses_inference_context(prepared_taskmodule, mock_model, monkeypatch):
+    pipeline = Pipeline(model=mock_model, taskmodule=prepared_taskmodule, device=-1)
+    modes = []
+    # predict() should not enter its own context, so we only replace the actual model calls
+    monkeypatch.setattr(pipeline.model, "forward", lambda inputs: None)
+    monkeypatch.setattr(
+        pipeline.model,
+        "decode",
+        lambda inputs, outputs: modes.append(
+            (torch.is_inference_mode_enabled(), torch.is_grad_enabled())
+        ),
+    )
+
+    pipeline._forward(({},))
+    monkeypatch.setattr(pipeline, "get_inference_context", lambda: torch.no_grad)
+    pipeline._forward(({},))
+
+    assert modes == [(True, False), (False, False)]
+
+
+@pytest.mark.parametrize("use_fallback", [False, True])
+def test_ensure_tensor_on_device(prepared_taskmodule, mock_model, monkeypatch, use_fallback):
+    if use_fallback:
+        # this is used if torch does not provide tree_map_only
+        monkeypatch.setattr(
+            "pytorch_ie.pipeline.tree_map_only", pytorch_ie.pipeline._tree_map_only
+        )
+    pipeline = Pipeline(model=mock_model, taskmodule=prepared_taskmodule, device=-1)
+    tensor = torch.tensor([1, 2])
+    inputs = (
+        {"input_ids": tensor, "lengths": [tensor, 3]},
+        UserDict({"attention_mask": tensor}),
+        ModelOutput(logits=tensor),
+        "no tensor",
+    )
+
+    outputs = pipeline._ensure_tensor_on_device(inputs, device=pipeline.device)
+
+    assert isinstance(outputs, tuple) and len(outputs) == 4
+    assert torch.equal(outputs[0]["input_ids"], tensor)
+    assert torch.equal(outputs[0]["lengths"][0], tensor) and outputs[0]["lengths"][1] == 3
+    assert isinstance(outputs[1], UserDict)
+    assert torch.equal(outputs[1]["attention_mask"], tensor)
+    assert isinstance(outputs[2], ModelOutput)
+    assert torch.equal(outputs[2]["logits"], tensor)
+    assert outputs[3] == "no tensor"
+
+
+def test_pipeline_compile_model(prepared_taskmodule, mock_model):
+    pipeline = Pipeline(
+        model=mock_model, taskmodule=prepared_taskmodule, device=-1, compile_model=True
+    )
+    assert pipeline.model._compiled_call_impl is not None
+
+
+def test_pipeline_compile_model_not_available(prepared_taskmodule, mock_model, monkeypatch):
+    # Module.compile() is not available in torch<2.2
+    monkeypatch.delattr(torch.nn.Module, "compile")
+    with pytest.raises(ValueError, match=r"compile_model=True requires torch>=2.2"):
+        Pipeline(model=mock_model, taskmodule=prepared_taskmodule, device=-1, compile_model=True)
+
+
+def test_get_length_order(documents):
+    model_inputs = [
+        TaskEncoding(document=documents[0], inputs={"input_ids": list(range(length))})
+        for length in [3, 1, 4, 1, 5]
+    ]
+    assert Pipeline.get_length_order(model_inputs) == [1, 3, 0, 2, 4]
+
+    model_inputs.append(TaskEncoding(document=documents[0], inputs=[1, 2]))
+    assert Pipeline.get_length_order(model_inputs) is None
+
+
+@pytest.mark.slow
+def test_pipeline_sort_by_length(documents, prepared_taskmodule, mock_model):
+    pipeline = Pipeline(model=mock_model, taskmodule=prepared_taskmodule, device=-1)
+
+    expected = pipeline(documents, inplace=False, batch_size=1)
+    returned_documents = pipeline(documents, inplace=False, batch_size=1, sort_by_length=True)
+
+    assert len(returned_documents) == len(expected)
+    for returned_document, expected_document in zip(returned_documents, expected):
+        assert returned_document.entities.predictions == expected_document.entities.predictions
+
+
+@pytest.mark.parametrize("num_model_inputs", [3, 16])
+def test_get_dataloader_num_workers(
+    documents, prepared_taskmodule, mock_model, num_model_inputs, monkeypatch
+):
+    monkeypatch.setattr("pytorch_ie.pipeline.get_available_cpu_count", lambda: 16)
+    pipeline = Pipeline(model=mock_model, taskmodule=prepared_taskmodule, device=-1)
+    model_inputs = [
+        TaskEncoding(document=documents[0], inputs={"input_ids": [1, 2, 3]})
+    ] * num_model_inputs
+
+    dataloader = pipeline.get_dataloader(model_inputs=model_inputs, batch_size=2, num_workers=4)
+
+    # workers are only spawned if there is at least one full batch per worker
+    assert dataloader.num_workers == (4 if num_model_inputs >= 8 else 0)
+
+
+def test_get_dataloader_num_workers_capped(
+    documents, prepared_taskmodule, mock_model, monkeypatch
+):
+    monkeypatch.setattr("pytorch_ie.pipeline.get_available_cpu_count", lambda: 2)
+    pipeline = Pipeline(model=mock_model, taskmodule=prepared_taskmodule, device=-1)
+    model_inputs = [TaskEncoding(document=documents[0], inputs={"input_ids": [1, 2, 3]})] * 16
+
+    dataloader = pipeline.get_dataloader(model_inputs=model_inputs, batch_size=2, num_workers=4)
+
+    # do not spawn more workers than there are CPUs available
+    assert dataloader.num_workers == 2
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("document_batch_size", [None, 2])
+def test_pipeline_stream_encodings(
+    documents, prepared_taskmodule, mock_model, document_batch_size
+):
+    pipeline = Pipeline(model=mock_model, taskmodule=prepared_taskmodule, device=-1)
+
+    expected = pipeline(documents, inplace=False)
+    returned_documents = pipeline(
+        documents,
+        inplace=False,
+        stream_encodings=True,
+        document_batch_size=document_batch_size,
+        batch_size=2,
+    )
+
+    assert len(returned_documents) == len(expected)
+    for returned_document, expected_document in zip(returned_documents, expected):
+        assert returned_document.entities.predictions == expected_document.entities.predictions
+
+
+@pytest.mark.slow
+def test_pipeline_stream_encodings_fast_dev_run(documents, prepared_taskmodule, mock_model):
+    pipeline = Pipeline(model=mock_model, taskmodule=prepared_taskmodule, device=-1)
+
+    returned_documents = pipeline(
+        documents, inplace=False, stream_encodings=True, document_batch_size=4, fast_dev_run=True
+    )
+
+    assert len(returned_documents) == 4
+
+
+@pytest.mark.slow
+def test_pipeline_single_batch_without_dataloader(
+    documents, prepared_taskmodule, mock_model, monkeypatch
+):
+    pipeline = Pipeline(model=mock_model, taskmodule=prepared_taskmodule, device=-1)
+
+    def get_dataloader(*args, **kwargs):
+        raise AssertionError("get_dataloader should not be called for a single batch")
+
+    monkeypatch.setattr(pipeline, "get_dataloader", get_dataloader)
+
+    returned_document = pipeline(documents[1], inplace=False)
+    assert returned_document.entities.predictions
+
+    returned_documents = pipeline(documents[:3], inplace=False, batch_size=8)
+    assert all(document.entities.predictions for document in returned_documents)